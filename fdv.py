@@ -8,18 +8,37 @@ from __future__ import annotations
 
 import argparse
 import base64
+import bisect
+import csv
 import errno
+import gzip
+import hashlib
+import io
 import json
+import math
+import os
+import random
 import re
+import secrets
+import selectors
+import signal
 import socket
+import stat
+import sys
 import threading
 import time
 import unicodedata
 import webbrowser
+import zlib
+from array import array
+from collections import OrderedDict, deque
 from datetime import datetime
+from functools import lru_cache
+from http.client import HTTPConnection, HTTPException
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from typing import Any, Dict, List, Sequence, Tuple
-from urllib.parse import parse_qs, quote, unquote, urlparse
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Sequence, Tuple
+from urllib.parse import quote, unquote, urlparse
 
 TITLE = "🔥 Outil FDV by HARDCORE — v0.9 🔥"
 VERSION = "0.9"
@@ -136,33 +155,84 @@ RACES = {
 }
 
 ALIAS_TO_RACE = {a.lower(): k for k, v in RACES.items() for a in v["aliases"]}
+# Exact spellings answered by one dict lookup; anything else goes through the normalising path.
+RACE_LOOKUP = {**ALIAS_TO_RACE, **{k: k for k in RACES}}
+
+_DIGITS_RE = re.compile(r"\d+")
+_DOTTED_SLOT_RE = re.compile(r"([1-3])\.([1-6])")
 
 
 def slot_to_label(slot: int) -> str:
     return f"{(slot - 1) // 6 + 1}.{(slot - 1) % 6 + 1}"
 
 
+SLOT_LOOKUP = {**{str(n): n for n in range(1, 19)}, **{slot_to_label(n): n for n in range(1, 19)}}
+
+
 def parse_slot(raw: str) -> int:
+    if type(raw) is int and 1 <= raw <= 18:
+        return raw
+    hit = SLOT_LOOKUP.get(raw) if type(raw) is str else None
+    if hit is not None:
+        return hit
     s = str(raw).strip().lower()
-    if re.fullmatch(r"\d+", s):
+    if _DIGITS_RE.fullmatch(s):
         n = int(s)
         if 1 <= n <= 18:
             return n
-    m = re.fullmatch(r"([1-3])\.([1-6])", s)
+    m = _DOTTED_SLOT_RE.fullmatch(s)
     if m:
         return (int(m.group(1)) - 1) * 6 + int(m.group(2))
     raise ValueError("Slot invalide (1..18 ou 1.1..3.6)")
 
 
 def normalize_race(raw: str) -> str:
+    hit = RACE_LOOKUP.get(raw) if type(raw) is str else None
+    if hit is not None:
+        return hit
     s = str(raw).strip().lower()
-    if s in RACES:
-        return s
-    if s in ALIAS_TO_RACE:
-        return ALIAS_TO_RACE[s]
+    if s in RACE_LOOKUP:
+        return RACE_LOOKUP[s]
     raise ValueError("Race invalide")
 
 
+def int_vector(text: str) -> List[int]:
+    """Every run of digits in ``text``, as re.findall(r"\\d+") would find them."""
+    flat = text.replace(",", " ")
+    if text.isascii() and flat.replace(" ", "").isdigit():
+        return list(map(int, flat.split()))
+    return list(map(int, _DIGITS_RE.findall(text)))
+
+
+def query_first(qs: str) -> Dict[str, str]:
+    """First non-blank value per key, same decoding as parse_qs without building the lists."""
+    out: Dict[str, str] = {}
+    for field in qs.split("&"):
+        name, eq, value = field.partition("=")
+        if not eq or not value:
+            continue
+        if "%" in name or "+" in name:
+            name = unquote(name.replace("+", " "))
+        if name in out:
+            continue
+        if "%" in value or "+" in value:
+            # Level vectors arrive as "41%2C49%2C...": decode the comma without the generic unquote.
+            value = value.replace("%2C", ",").replace("%2c", ",").replace("+", " ")
+            if "%" in value:
+                value = unquote(value)
+        out[name] = value
+    return out
+
+
+def split_target(target: str) -> Tuple[str, str]:
+    """(path, query) of a request target, as urlparse gives them."""
+    if target[:1] == "/" and target[1:2] != "/" and not any(c in target for c in "#;\t"):
+        path, _, query = target.partition("?")
+        return path, query
+    u = urlparse(target)
+    return u.path, u.query
+
+
 def canon(s: str) -> str:
     t = unicodedata.normalize("NFKD", s.lower())
     t = "".join(ch for ch in t if not unicodedata.combining(ch))
@@ -171,7 +241,13 @@ def canon(s: str) -> str:
 
 
 def required_levels(race: str, slot: int) -> List[int]:
-    return list(RACES[race]["levels"][slot - 1])
+    return MODELS[race].row(slot)
+
+
+def levels_from_arg(value: Any) -> List[int]:
+    if isinstance(value, list):
+        return [max(0, int(x)) for x in value]
+    return int_vector(str(value or ""))
 
 
 def parse_levels_text(race: str, text: str) -> List[int]:
@@ -187,10 +263,7 @@ def parse_levels_text(race: str, text: str) -> List[int]:
             out[i] = max(0, v)
         return out
 
-    name_map = {canon(name): i for i, (_, name) in enumerate(b)}
-    for i, (_, name) in enumerate(b):
-        name_map[str(i + 1)] = i
-        name_map[canon(name[:24])] = i
+    name_map = building_name_map(race)
 
     for line in raw.splitlines():
         line = line.strip()
@@ -219,35 +292,203 @@ def parse_levels_text(race: str, text: str) -> List[int]:
     return out
 
 
+def building_name_map(race: str) -> Dict[str, int]:
+    b = RACES[race]["buildings"]
+    name_map = {canon(name): i for i, (_, name) in enumerate(b)}
+    for i, (_, name) in enumerate(b):
+        name_map[str(i + 1)] = i
+        name_map[canon(name[:24])] = i
+    return name_map
+
+
+def building_index(race: str, raw: Any) -> int:
+    """Building column from its 1-based number or (part of) its name."""
+    name_map = building_name_map(race)
+    ck = canon(str(raw))
+    if ck in name_map:
+        return name_map[ck]
+    if ck:
+        hits = {i for nk, i in name_map.items() if nk and not nk.isdigit() and (nk in ck or ck in nk)}
+        if len(hits) == 1:
+            return hits.pop()
+        if hits:
+            raise ValueError("Bâtiment ambigu: " + ", ".join(RACES[race]["buildings"][i][1] for i in sorted(hits)))
+    raise ValueError("Bâtiment invalide")
+
+
+def priority_category(index: int, name: str) -> int:
+    n = name.lower()
+    if index in (0, 1):
+        return 0
+    if "t1→t2" in n:
+        return 1
+    if "t2→t3" in n:
+        return 2
+    return 3
+
+
 def compute_priority(buildings: Sequence[Tuple[str, str]], missing: Sequence[int]) -> List[Dict[str, Any]]:
     ranked: List[Tuple[int, int, int]] = []
     for i, (_, name) in enumerate(buildings):
         miss = missing[i]
         if miss <= 0:
             continue
-        n = name.lower()
-        if i in (0, 1):
-            cat = 0
-        elif "t1→t2" in n:
-            cat = 1
-        elif "t2→t3" in n:
-            cat = 2
-        else:
-            cat = 3
-        ranked.append((cat, -miss, i))
+        ranked.append((priority_category(i, name), -miss, i))
     ranked.sort()
     return [{"index": i, "building": buildings[i][1], "missing": missing[i], "category": c} for c, _, i in ranked]
 
 
+class RaceModel:
+    """Dense view of one race shared by the web app and the terminal tool.
+
+    Building ids are column indices; ``levels`` is one flat array, row-major by slot.
+    """
+
+    __slots__ = ("key", "display", "color", "aliases", "emojis", "names", "categories", "n", "slots", "levels")
+
+    def __init__(
+        self,
+        key: str,
+        display: str,
+        color: str,
+        aliases: Sequence[str],
+        buildings: Sequence[Tuple[str, str]],
+        rows: Sequence[Sequence[int]],
+    ) -> None:
+        self.key = key
+        self.display = display
+        self.color = color
+        self.aliases = tuple(aliases)
+        self.emojis = tuple(em for em, _ in buildings)
+        self.names = tuple(name for _, name in buildings)
+        self.categories = tuple(priority_category(i, name) for i, name in enumerate(self.names))
+        self.n = len(buildings)
+        self.slots = len(rows)
+        if any(len(r) != self.n for r in rows):
+            raise ValueError(f"{key}: lignes de niveaux incohérentes")
+        self.levels = array("H", [v for r in rows for v in r])
+
+    @classmethod
+    def from_config(cls, key: str, cfg: Dict[str, Any]) -> "RaceModel":
+        return cls(key, cfg["display"], cfg["color"], cfg["aliases"], cfg["buildings"], cfg["levels"])
+
+    def row(self, slot: int) -> List[int]:
+        o = (slot - 1) * self.n
+        return self.levels[o : o + self.n].tolist()
+
+    def required(self, slot: int, building: int) -> int:
+        return self.levels[(slot - 1) * self.n + building]
+
+    def max_slot(self, current: Sequence[int]) -> int:
+        n, lv = self.n, self.levels
+        cur = [current[i] if i < len(current) else 0 for i in range(n)]
+        for slot in range(self.slots):
+            o = slot * n
+            for i in range(n):
+                if not cur[i] >= lv[o + i]:
+                    return slot
+        return self.slots
+
+
+def build_models(races: Dict[str, Dict[str, Any]]) -> Dict[str, RaceModel]:
+    return {k: RaceModel.from_config(k, v) for k, v in races.items()}
+
+
+MODELS = build_models(RACES)
+
+
 def compute_max_slot(race: str, current: Sequence[int]) -> int:
-    mx = 0
-    for slot in range(1, 19):
-        req = required_levels(race, slot)
-        if all((current[i] if i < len(current) else 0) >= req[i] for i in range(len(req))):
-            mx = slot
-        else:
-            break
-    return mx
+    return MODELS[race].max_slot(current)
+
+
+class UnlockIndex:
+    """Inverted requirement table of one race: building -> level -> slots.
+
+    ``ceiling[b]`` is the running max of column ``b`` over slots, so it is sorted and
+    bisecting it answers "first slot needing level L" and "slots 1..k all satisfied".
+    ``by_level[b]`` holds the slots sorted by their own requirement for the exact sets.
+    """
+
+    __slots__ = ("race", "ceiling", "by_level", "slots_by_level")
+
+    def __init__(self, model: RaceModel) -> None:
+        self.race = model.key
+        self.ceiling: List[List[int]] = []
+        self.by_level: List[List[int]] = []
+        self.slots_by_level: List[List[int]] = []
+        for b in range(model.n):
+            col = [model.required(slot, b) for slot in range(1, model.slots + 1)]
+            run, top = [], 0
+            for v in col:
+                top = max(top, v)
+                run.append(top)
+            pairs = sorted((v, slot) for slot, v in enumerate(col, 1))
+            self.ceiling.append(run)
+            self.by_level.append([v for v, _ in pairs])
+            self.slots_by_level.append([slot for _, slot in pairs])
+
+    def first_slot(self, building: int, level: int) -> int | None:
+        if level <= 0:
+            return None
+        pos = bisect.bisect_left(self.ceiling[building], level)
+        return pos + 1 if pos < len(self.ceiling[building]) else None
+
+    def satisfied_through(self, building: int, level: int) -> int:
+        return bisect.bisect_right(self.ceiling[building], level)
+
+    def satisfies(self, building: int, level: int) -> List[int]:
+        k = bisect.bisect_right(self.by_level[building], level)
+        return sorted(self.slots_by_level[building][:k])
+
+    def required_by(self, building: int, level: int) -> List[int]:
+        lo = bisect.bisect_left(self.by_level[building], level)
+        hi = bisect.bisect_right(self.by_level[building], level)
+        return sorted(self.slots_by_level[building][lo:hi]) if level > 0 else []
+
+
+_UNLOCK: Dict[str, UnlockIndex] = {}
+
+
+def unlock_index(race: str) -> UnlockIndex:
+    idx = _UNLOCK.get(race)
+    if idx is None:
+        idx = _UNLOCK[race] = UnlockIndex(MODELS[race])
+    return idx
+
+
+def unlock_query(race: str, building: int, level: Any) -> Dict[str, Any]:
+    """What reaching ``level`` on ``building`` means for each slot of ``race``."""
+    m = MODELS[race]
+    if not 0 <= building < m.n:
+        raise ValueError("Bâtiment invalide")
+    if level is None or level == "":
+        raise ValueError("level requis")
+    if isinstance(level, bool):
+        raise ValueError("level doit être un entier")
+    try:
+        level = max(0, int(level))
+    except (TypeError, ValueError):
+        raise ValueError("level doit être un entier") from None
+    idx = unlock_index(race)
+    first = idx.first_slot(building, level)
+    through = idx.satisfied_through(building, level)
+    nxt = None
+    if through < m.slots:
+        nxt = {"slot": through + 1, "slot_label": slot_to_label(through + 1), "required": m.required(through + 1, building)}
+    return {
+        "race": race,
+        "index": building,
+        "emoji": m.emojis[building],
+        "building": m.names[building],
+        "level": level,
+        "first_slot": first,
+        "first_slot_label": slot_to_label(first) if first else None,
+        "required_by": idx.required_by(building, level),
+        "satisfies": idx.satisfies(building, level),
+        "satisfied_through": through,
+        "satisfied_through_label": slot_to_label(through) if through else None,
+        "next": nxt,
+    }
 
 
 def build_slot_payload(race: str, slot: int) -> Dict[str, Any]:
@@ -266,51 +507,227 @@ def build_slot_payload(race: str, slot: int) -> Dict[str, Any]:
     }
 
 
-def build_delta_payload(race: str, slot: int, current: Sequence[int]) -> Dict[str, Any]:
-    cfg = RACES[race]
-    req = required_levels(race, slot)
-    cur = [max(0, int(current[i] if i < len(current) else 0)) for i in range(len(req))]
-    miss = [max(0, req[i] - cur[i]) for i in range(len(req))]
-    ok_count = sum(1 for i in range(len(req)) if miss[i] == 0)
-    progress = int((ok_count / len(req)) * 100) if req else 0
-    maxslot = compute_max_slot(race, cur)
-    nextslot = min(18, maxslot + 1) if maxslot < 18 else 18
-    return {
-        "race": race,
-        "slot": slot,
-        "slot_label": slot_to_label(slot),
-        "population": POP_THRESHOLDS[slot - 1],
-        "rows": [
+def _js(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+class DeltaFragments:
+    """Pre-encoded constant JSON pieces of a delta payload for one (race, slot).
+
+    Splicing the variable numbers between them gives exactly the bytes of
+    ``json.dumps(payload, ensure_ascii=False)``.
+    """
+
+    __slots__ = ("head", "row_pre", "row_mid", "prio_pre", "prio_post")
+
+    def __init__(self, race: str, slot: int) -> None:
+        m = MODELS[race]
+        req = m.row(slot)
+        self.head = b"".join([
+            b'{"race": ', _js(race), b', "slot": %d, "slot_label": ' % slot, _js(slot_to_label(slot)),
+            b', "population": %d, "rows": [' % POP_THRESHOLDS[slot - 1],
+        ])
+        self.row_pre = [
+            b'{"index": %d, "emoji": %s, "building": %s, "current": ' % (i, _js(m.emojis[i]), _js(m.names[i]))
+            for i in range(m.n)
+        ]
+        self.row_mid = [b', "required": %d, "missing": ' % req[i] for i in range(m.n)]
+        self.prio_pre = [b'{"index": %d, "building": %s, "missing": ' % (i, _js(m.names[i])) for i in range(m.n)]
+        self.prio_post = [b', "category": %d}' % c for c in m.categories]
+
+
+_FRAGMENTS: Dict[Tuple[str, int], DeltaFragments] = {}
+
+
+def delta_fragments(race: str, slot: int) -> DeltaFragments:
+    frag = _FRAGMENTS.get((race, slot))
+    if frag is None:
+        frag = _FRAGMENTS[(race, slot)] = DeltaFragments(race, slot)
+    return frag
+
+
+class DeltaResult:
+    """Delta between ``current`` and the requirements of ``slot``.
+
+    Only the clamped level vector is built up front; everything else is computed on
+    access, so callers that need ``maxslot`` or ``total_missing`` skip the row dicts.
+    """
+
+    __slots__ = ("race", "slot", "model", "current", "_required", "_missing", "_maxslot")
+
+    def __init__(self, race: str, slot: int, current: Sequence[int], maxslot: int | None = None) -> None:
+        self.race = race
+        self.slot = slot
+        self.model = MODELS[race]
+        n = self.model.n
+        self.current = [max(0, int(current[i] if i < len(current) else 0)) for i in range(n)]
+        self._required: List[int] | None = None
+        self._missing: List[int] | None = None
+        self._maxslot = maxslot
+
+    @property
+    def required(self) -> List[int]:
+        if self._required is None:
+            self._required = self.model.row(self.slot)
+        return self._required
+
+    @property
+    def missing(self) -> List[int]:
+        if self._missing is None:
+            self._missing = [max(0, r - c) for r, c in zip(self.required, self.current)]
+        return self._missing
+
+    @property
+    def total_missing(self) -> int:
+        return sum(self.missing)
+
+    @property
+    def progress(self) -> int:
+        miss = self.missing
+        return int((miss.count(0) / len(miss)) * 100) if miss else 0
+
+    @property
+    def maxslot(self) -> int:
+        if self._maxslot is None:
+            self._maxslot = self.model.max_slot(self.current)
+        return self._maxslot
+
+    @property
+    def nextslot(self) -> int:
+        return min(18, self.maxslot + 1) if self.maxslot < 18 else 18
+
+    @property
+    def rows(self) -> List[Dict[str, Any]]:
+        m = self.model
+        cur, req, miss = self.current, self.required, self.missing
+        return [
             {
                 "index": i,
-                "emoji": cfg["buildings"][i][0],
-                "building": cfg["buildings"][i][1],
+                "emoji": m.emojis[i],
+                "building": m.names[i],
                 "current": cur[i],
                 "required": req[i],
                 "missing": miss[i],
                 "ok": miss[i] == 0,
             }
-            for i in range(len(req))
-        ],
-        "priority": compute_priority(cfg["buildings"], miss),
-        "progress": progress,
-        "maxslot": maxslot,
-        "nextslot": nextslot,
-        "nextslot_label": slot_to_label(nextslot),
-    }
+            for i in range(m.n)
+        ]
+
+    @property
+    def priority(self) -> List[Dict[str, Any]]:
+        return compute_priority(RACES[self.race]["buildings"], self.missing)
+
+    def to_dict(self) -> Dict[str, Any]:
+        nextslot = self.nextslot
+        return {
+            "race": self.race,
+            "slot": self.slot,
+            "slot_label": slot_to_label(self.slot),
+            "population": POP_THRESHOLDS[self.slot - 1],
+            "rows": self.rows,
+            "priority": self.priority,
+            "progress": self.progress,
+            "maxslot": self.maxslot,
+            "nextslot": nextslot,
+            "nextslot_label": slot_to_label(nextslot),
+        }
+
+    def to_json(self) -> str:
+        return self.to_json_bytes().decode("utf-8")
+
+    def to_json_bytes(self) -> bytes:
+        f = delta_fragments(self.race, self.slot)
+        cur, miss = self.current, self.missing
+        rows = b", ".join([
+            b"%s%d%s%d, \"ok\": %s}" % (f.row_pre[i], cur[i], f.row_mid[i], miss[i], b"true" if miss[i] == 0 else b"false")
+            for i in range(len(cur))
+        ])
+        ranked = sorted((self.model.categories[i], -x, i) for i, x in enumerate(miss) if x > 0)
+        prio = b", ".join([b"%s%d%s" % (f.prio_pre[i], miss[i], f.prio_post[i]) for _, _, i in ranked])
+        nextslot = self.nextslot
+        return b"%s%s], \"priority\": [%s], \"progress\": %d, \"maxslot\": %d, \"nextslot\": %d, \"nextslot_label\": \"%s\"}" % (
+            f.head, rows, prio, self.progress, self.maxslot, nextslot, slot_to_label(nextslot).encode("ascii"),
+        )
+
+    def to_text(self) -> str:
+        m = self.model
+        lines = [f"[FDV] {m.display} slot {slot_to_label(self.slot)}", f"Population: {POP_THRESHOLDS[self.slot - 1]}"]
+        lines.extend(
+            f"- {m.names[i]}: actuel {c} / requis {r} / manque {x}"
+            for i, (c, r, x) in enumerate(zip(self.current, self.required, self.missing))
+        )
+        return "\n".join(lines)
+
+
+class AutoslotResult:
+    """Highest reached slot for ``current`` and a lazy delta towards the next one."""
+
+    __slots__ = ("race", "raw", "_maxslot", "_delta")
+
+    def __init__(self, race: str, current: Sequence[int]) -> None:
+        self.race = race
+        self.raw = current
+        self._maxslot: int | None = None
+        self._delta: DeltaResult | None = None
+
+    @property
+    def maxslot(self) -> int:
+        if self._maxslot is None:
+            self._maxslot = compute_max_slot(self.race, self.raw)
+        return self._maxslot
+
+    @property
+    def nextslot(self) -> int:
+        return min(18, self.maxslot + 1) if self.maxslot < 18 else 18
+
+    @property
+    def delta_next(self) -> DeltaResult:
+        if self._delta is None:
+            self._delta = DeltaResult(self.race, self.nextslot, self.raw)
+        return self._delta
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"race": self.race, "maxslot": self.maxslot, "nextslot": self.nextslot, "deltaNext": self.delta_next.to_dict()}
+
+    def to_json(self) -> str:
+        return self.to_json_bytes().decode("utf-8")
+
+    def to_json_bytes(self) -> bytes:
+        return b'{"race": %s, "maxslot": %d, "nextslot": %d, "deltaNext": %s}' % (
+            _js(self.race), self.maxslot, self.nextslot, self.delta_next.to_json_bytes(),
+        )
+
+
+def build_delta_payload(race: str, slot: int, current: Sequence[int], maxslot: int | None = None) -> Dict[str, Any]:
+    return DeltaResult(race, slot, current, maxslot).to_dict()
 
 
 def build_autoslot_payload(race: str, current: Sequence[int]) -> Dict[str, Any]:
-    maxslot = compute_max_slot(race, current)
-    nextslot = min(18, maxslot + 1) if maxslot < 18 else 18
-    delta = build_delta_payload(race, nextslot, current)
-    return {"race": race, "maxslot": maxslot, "nextslot": nextslot, "deltaNext": delta}
+    return AutoslotResult(race, current).to_dict()
+
+
+def build_state_payload(race: str, slot: int, tier: int, current: Sequence[int]) -> Dict[str, Any]:
+    # Everything renderAll needs in one go; max slot and the delta are computed once and shared.
+    # "auto" is exactly /api/autoslot, whose max slot sees the raw (unclamped) levels.
+    res = DeltaResult(race, slot, current)
+    auto = AutoslotResult(race, current)
+    maxslot, nextslot = auto.maxslot, auto.nextslot
+    delta = res.to_dict()
+    delta_next = delta if nextslot == slot else DeltaResult(race, nextslot, res.current, res.maxslot).to_dict()
+    return {
+        "race": race,
+        "slot": build_slot_payload(race, slot),
+        "delta": delta,
+        "full": build_full_payload(race, tier),
+        "auto": {"race": race, "maxslot": maxslot, "nextslot": nextslot, "deltaNext": delta_next},
+    }
 
 
 def build_full_payload(race: str, tier: int) -> Dict[str, Any]:
     if tier not in (1, 2, 3):
         raise ValueError("tier doit être 1|2|3")
     cfg = RACES[race]
+    model = MODELS[race]
     start = (tier - 1) * 6 + 1
     slots = list(range(start, start + 6))
     return {
@@ -322,7 +739,7 @@ def build_full_payload(race: str, tier: int) -> Dict[str, Any]:
                 "index": i,
                 "emoji": em,
                 "building": name,
-                "values": [cfg["levels"][s - 1][i] for s in slots],
+                "values": [model.required(s, i) for s in slots],
             }
             for i, (em, name) in enumerate(cfg["buildings"])
         ],
@@ -340,10 +757,532 @@ def races_payload() -> Dict[str, Any]:
                 "slots": [slot_to_label(i) for i in range(1, 19)],
             }
             for k, v in RACES.items()
-        ]
+        ],
+        "dataset": dataset_fingerprint(),
+    }
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Coalesce identical concurrent computations and keep recent results in a bounded LRU."""
+
+    def __init__(self, maxsize: int = 2048) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self.hits = self.misses = self.shared = self.evictions = 0
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+        assert flight is not None
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None:
+                    self._cache[key] = flight.result
+                    while len(self._cache) > self.maxsize:
+                        self._cache.popitem(last=False)
+                        self.evictions += 1
+            flight.done.set()
+        return flight.result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "evictions": self.evictions,
+            }
+
+
+RESULTS = SingleFlight()
+
+
+def levels_key(race: str, current: Sequence[Any]) -> Tuple[int, ...] | None:
+    # Cache key for a raw level vector as compute_max_slot sees it; None when it isn't plain ints.
+    n = MODELS[race].n
+    if not all(type(x) is int for x in current):
+        return None
+    return tuple(current[i] if i < len(current) else 0 for i in range(n))
+
+
+def delta_json(race: str, slot: int, current: Sequence[Any]) -> bytes:
+    res = DeltaResult(race, slot, current)
+    return RESULTS.get(("delta", race, slot, tuple(res.current)), res.to_json_bytes)
+
+
+def autoslot_json(race: str, current: Sequence[Any]) -> bytes:
+    key = levels_key(race, current)
+    if key is None:
+        return AutoslotResult(race, current).to_json_bytes()
+    return RESULTS.get(("autoslot", race, key), lambda: AutoslotResult(race, current).to_json_bytes())
+
+
+def export_json(race: str, slot: int, current: Sequence[int], fmt: str) -> bytes:
+    res = DeltaResult(race, slot, current)
+    if fmt == "json":
+        return RESULTS.get(("delta", race, slot, tuple(res.current)), res.to_json_bytes)
+    return RESULTS.get(
+        ("export-txt", race, slot, tuple(res.current)),
+        lambda: json.dumps({"format": "txt", "text": res.to_text()}, ensure_ascii=False).encode("utf-8"),
+    )
+
+
+class UpgradePlan:
+    """Cost curve and slot-by-slot build order from one level vector.
+
+    Reaching slot ``s`` means every building at the running max of its column up to
+    ``s``, so the cost (weighted levels still to build) only grows with ``s``: the best
+    slot for a budget is a bisection on ``costs``, and unlocking the slots in order is
+    an optimal build order.
+    """
+
+    __slots__ = ("race", "current", "weights", "maxslot", "costs", "steps")
+
+    def __init__(self, race: str, current: Sequence[int], weights: Sequence[float]) -> None:
+        m = MODELS[race]
+        ceiling = unlock_index(race).ceiling
+        self.race = race
+        self.current = [max(0, int(current[i] if i < len(current) else 0)) for i in range(m.n)]
+        self.weights = list(weights)
+        self.maxslot = m.max_slot(self.current)
+        self.costs: List[float] = [0]
+        self.steps: List[List[Dict[str, Any]]] = [[]]
+        reached = list(self.current)
+        for slot in range(1, m.slots + 1):
+            ups: List[Tuple[int, int, int, int]] = []
+            for b in range(m.n):
+                target = ceiling[b][slot - 1]
+                if target > reached[b]:
+                    ups.append((m.categories[b], reached[b] - target, b, reached[b]))
+                    reached[b] = target
+            ups.sort()
+            step = [
+                {"index": b, "building": m.names[b], "from": frm, "to": frm - neg, "levels": -neg, "category": c}
+                for c, neg, b, frm in ups
+            ]
+            self.costs.append(self.costs[-1] + sum(self.weights[u["index"]] * u["levels"] for u in step))
+            self.steps.append(step)
+
+    def for_budget(self, budget: float, plan: bool = True) -> Dict[str, Any]:
+        slot = bisect.bisect_right(self.costs, budget) - 1
+        out: Dict[str, Any] = {
+            "budget": budget,
+            "slot": slot,
+            "slot_label": slot_to_label(slot) if slot else None,
+            "cost": self.costs[slot],
+            "leftover": budget - self.costs[slot],
+        }
+        if slot + 1 < len(self.costs):
+            out["next"] = {"slot": slot + 1, "slot_label": slot_to_label(slot + 1), "cost": self.costs[slot + 1], "short": self.costs[slot + 1] - budget}
+        else:
+            out["next"] = None
+        if plan:
+            out["plan"] = [
+                {"slot": k, "slot_label": slot_to_label(k), "cost": self.costs[k] - self.costs[k - 1], "cumulative": self.costs[k], "upgrades": self.steps[k]}
+                for k in range(self.maxslot + 1, slot + 1)
+            ]
+        return out
+
+
+ACCOUNT_MAX_PLANETS = 1000
+
+
+def account_payload(planets: Sequence[Any]) -> Dict[str, Any]:
+    """Per-planet autoslot/delta plus account totals; planets sharing a race and levels share the work."""
+    if len(planets) > ACCOUNT_MAX_PLANETS:
+        raise ValueError(f"Trop de planètes (max {ACCOUNT_MAX_PLANETS})")
+    autos: Dict[Tuple[str, Tuple[int, ...]], AutoslotResult] = {}
+    deltas: Dict[Tuple[str, int, Tuple[int, ...]], DeltaResult] = {}
+    dicts: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    totals: Dict[str, List[int]] = {}
+    counts: Dict[str, int] = {}
+    rows: List[Dict[str, Any]] = []
+    cheapest: Dict[str, Any] | None = None
+    cheapest_vec: Tuple[int, ...] = ()
+    for n, p in enumerate(planets):
+        if not isinstance(p, dict):
+            raise ValueError("planets doit être une liste d'objets")
+        race = normalize_race(p.get("race", "humains"))
+        m = MODELS[race]
+        vec = tuple(levels_from_arg(p.get("current", []))[: m.n])
+        vec += (0,) * (m.n - len(vec))
+        # The reached slot is judged on the raw levels, as /api/autoslot does (a negative one fails).
+        raw = levels_key(race, p["current"]) if isinstance(p.get("current"), list) else None
+        raw = vec if raw is None else raw
+        auto = autos.get((race, raw))
+        if auto is None:
+            auto = autos[(race, raw)] = AutoslotResult(race, raw)
+        target = parse_slot(str(p["slot"])) if p.get("slot") not in (None, "") else auto.nextslot
+        delta = deltas.get((race, target, vec))
+        if delta is None:
+            delta = deltas[(race, target, vec)] = DeltaResult(race, target, vec, auto.maxslot)
+        auto_key, delta_key = ("auto", race, raw), ("delta", race, target, vec)
+        if auto_key not in dicts:
+            dicts[auto_key] = auto.to_dict()
+        if delta_key not in dicts:
+            dicts[delta_key] = delta.to_dict()
+        name = str(p.get("name") or f"Planète {n + 1}")
+        rows.append({"name": name, "race": race, "slot": target, "autoslot": dicts[auto_key], "delta": dicts[delta_key]})
+        acc = totals.setdefault(race, [0] * m.n)
+        for i, x in enumerate(delta.missing):
+            acc[i] += x
+        counts[race] = counts.get(race, 0) + 1
+        if auto.maxslot < m.slots:
+            nxt = auto.maxslot + 1
+            ceiling = unlock_index(race).ceiling
+            cost = sum(max(0, ceiling[b][nxt - 1] - vec[b]) for b in range(m.n))
+            if cheapest is None or cost < cheapest["cost"]:
+                cheapest = {"planet": n, "name": name, "race": race, "slot": nxt, "slot_label": slot_to_label(nxt), "cost": cost}
+                cheapest_vec = vec
+    if cheapest is not None:
+        up = upgrade_plan(cheapest["race"], cheapest_vec, (1,) * MODELS[cheapest["race"]].n)
+        cheapest["upgrades"] = up.steps[cheapest["slot"]]
+    by_race = {
+        race: {
+            "display": MODELS[race].display,
+            "planets": counts[race],
+            "missing": [{"index": i, "building": MODELS[race].names[i], "missing": x} for i, x in enumerate(acc)],
+            "total_missing": sum(acc),
+        }
+        for race, acc in totals.items()
+    }
+    return {
+        "planets": rows,
+        "totals": by_race,
+        "total_missing": sum(t["total_missing"] for t in by_race.values()),
+        "cheapest_next": cheapest,
+    }
+
+
+LOG_THRESHOLDS = [math.log(t) for t in POP_THRESHOLDS]
+PROJECTION_MAX_PLANETS = 5000
+
+
+def project_planet(population: float, rate: float, race: str | None = None, current: Sequence[Any] | None = None) -> Dict[str, Any]:
+    """Hours until each population threshold at compound growth ``rate`` per hour.
+
+    t = (ln T - ln P) / ln(1 + r), with ln T precomputed: one pass over the 18 slots.
+    """
+    if not math.isfinite(population) or population < 0:
+        raise ValueError("population doit être un nombre positif")
+    if not math.isfinite(rate) or rate <= -1:
+        raise ValueError("rate doit être > -1 (croissance par heure, 0.02 = 2 %)")
+    pop_slot = bisect.bisect_right(POP_THRESHOLDS, population)
+    if rate > 0 and population > 0:
+        lp = math.log(population)
+        k = 1.0 / math.log1p(rate)
+        eta = [0.0] * pop_slot + [round((lt - lp) * k, 2) for lt in LOG_THRESHOLDS[pop_slot:]]
+    else:
+        # No growth, or nothing to grow from: compound growth from 0 never moves.
+        eta = [0.0] * pop_slot + [None] * (len(LOG_THRESHOLDS) - pop_slot)
+    pop = int(population) if float(population).is_integer() else population
+    out: Dict[str, Any] = {"population": pop, "rate": rate, "pop_slot": pop_slot, "eta_hours": eta}
+    slot = pop_slot
+    if race is not None:
+        build_slot = compute_max_slot(race, levels_from_arg(current or []))
+        slot = min(pop_slot, build_slot)
+        out["race"] = race
+        out["build_slot"] = build_slot
+        if slot >= len(POP_THRESHOLDS):
+            out["binding"] = None
+        elif pop_slot == build_slot:
+            out["binding"] = "both"
+        else:
+            out["binding"] = "population" if pop_slot < build_slot else "buildings"
+    out["slot"] = slot
+    if slot < len(POP_THRESHOLDS):
+        out["next"] = {"slot": slot + 1, "slot_label": slot_to_label(slot + 1), "population": POP_THRESHOLDS[slot], "eta_hours": eta[slot]}
+    else:
+        out["next"] = None
+    return out
+
+
+def _number(value: Any, message: str) -> float:
+    # float() with our own message: Python's ("could not convert string to float") must not reach users.
+    if isinstance(value, bool):
+        raise ValueError(message)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(message) from None
+
+
+def _planet_number(p: Dict[str, Any], key: str, message: str) -> float:
+    return _number(p.get(key, 0), message)
+
+
+def project_population(planets: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if len(planets) > PROJECTION_MAX_PLANETS:
+        raise ValueError(f"Trop de planètes (max {PROJECTION_MAX_PLANETS})")
+    out: List[Dict[str, Any]] = []
+    for i, p in enumerate(planets):
+        if not isinstance(p, dict):
+            raise ValueError("planets doit être une liste d'objets")
+        race = normalize_race(p["race"]) if p.get("race") else None
+        population = _planet_number(p, "population", "population doit être un nombre positif")
+        rate = _planet_number(p, "rate", "rate doit être > -1 (croissance par heure, 0.02 = 2 %)")
+        res = project_planet(population, rate, race, p.get("current"))
+        res["name"] = str(p.get("name") or f"Planète {i + 1}")
+        out.append(res)
+    return out
+
+
+OPTIMIZE_TIME_BUDGET_MS = 200
+OPTIMIZE_MAX_TIME_BUDGET_MS = 2000
+
+
+def parse_weights(race: str, raw: Any) -> Tuple[float, ...]:
+    # Relative cost of one level per building (e.g. resources per level); 1 each by default.
+    n = MODELS[race].n
+    weights: List[float] = [1] * n
+    if raw in (None, "", [], {}):
+        return tuple(weights)
+    if isinstance(raw, dict):
+        items = [(building_index(race, k), v) for k, v in raw.items()]
+    elif isinstance(raw, list):
+        items = list(enumerate(raw[:n]))
+    else:
+        raise ValueError("weights doit être une liste ou un objet")
+    for i, v in items:
+        w = _number(v, "weights doit contenir des nombres positifs")
+        if not math.isfinite(w) or w < 0:
+            raise ValueError("weights doit contenir des nombres positifs")
+        weights[i] = int(w) if w == int(w) else w
+    return tuple(weights)
+
+
+def upgrade_plan(race: str, current: Sequence[Any], weights: Tuple[float, ...]) -> UpgradePlan:
+    vec = tuple(max(0, int(x)) for x in current[: MODELS[race].n])
+    return RESULTS.get(("plan", race, vec, weights), lambda: UpgradePlan(race, vec, weights))
+
+
+def optimize_payload(
+    race: str,
+    current: Sequence[Any],
+    budgets: Sequence[Any],
+    weights: Any = None,
+    plan: bool = True,
+    time_budget_ms: float = OPTIMIZE_TIME_BUDGET_MS,
+) -> Dict[str, Any]:
+    deadline = time.perf_counter() + min(max(0.0, float(time_budget_ms)), OPTIMIZE_MAX_TIME_BUDGET_MS) / 1000
+    up = upgrade_plan(race, current, parse_weights(race, weights))
+    results: List[Dict[str, Any]] = []
+    truncated = False
+    for raw in budgets:
+        if results and time.perf_counter() > deadline:
+            truncated = True
+            break
+        budget = _number(raw, "budget doit être un nombre positif")
+        if not math.isfinite(budget) or budget < 0:
+            raise ValueError("budget doit être un nombre positif")
+        results.append(up.for_budget(int(budget) if budget == int(budget) else budget, plan))
+    return {
+        "race": race,
+        "current": up.current,
+        "weights": list(up.weights),
+        "maxslot": up.maxslot,
+        "curve": [{"slot": k, "cost": c} for k, c in enumerate(up.costs) if k],
+        "results": results,
+        "truncated": truncated,
     }
 
 
+# Share links: version byte (0x80 = zlib), then [fingerprint:2][race:1][slot:1][n:1][n varint levels], base64url.
+LINK_VERSION = 1
+LINK_ZLIB = 0x80
+LINK_MAX_CHARS = 256
+
+
+def dataset_fingerprint() -> int:
+    # 16 bits of the tables ETag: enough to tell a link made against other tables.
+    return int(tables_body()[1][1:5], 16)
+
+
+def encode_link(race: str, slot: int, current: Sequence[Any]) -> str:
+    m = MODELS[race]
+    out = bytearray(dataset_fingerprint().to_bytes(2, "big"))
+    out += bytes((list(RACES).index(race), slot, m.n))
+    for i in range(m.n):
+        v = max(0, int(current[i])) if i < len(current) else 0
+        if v >= 1 << 32:
+            raise ValueError("Niveau trop grand")
+        while v > 0x7F:
+            out.append(v & 0x7F | 0x80)
+            v >>= 7
+        out.append(v)
+    packed = zlib.compress(bytes(out), 9)
+    head, body = (LINK_VERSION | LINK_ZLIB, packed) if len(packed) < len(out) else (LINK_VERSION, bytes(out))
+    return base64.urlsafe_b64encode(bytes((head,)) + body).rstrip(b"=").decode("ascii")
+
+
+def decode_link(code: str) -> Tuple[str, int, List[int], bool]:
+    """(race, slot, current, stale) from a share code; stale when the tables changed since."""
+    code = code.strip()
+    if not code or len(code) > LINK_MAX_CHARS:
+        raise ValueError("Lien invalide")
+    try:
+        raw = base64.b64decode(code + "=" * (-len(code) % 4), altchars=b"-_", validate=True)
+        if raw[0] & ~LINK_ZLIB != LINK_VERSION:
+            raise ValueError("Version de lien inconnue")
+        body = raw[1:]
+        if raw[0] & LINK_ZLIB:
+            d = zlib.decompressobj()
+            body = d.decompress(body, 1024)
+            if d.unconsumed_tail or not d.eof:
+                raise ValueError("Lien invalide")
+        fp, ri, slot, n = int.from_bytes(body[:2], "big"), body[2], body[3], body[4]
+        pos, current = 5, []
+        for _ in range(n):
+            v = shift = 0
+            while True:
+                b = body[pos]
+                pos += 1
+                v |= (b & 0x7F) << shift
+                shift += 7
+                if b < 0x80:
+                    break
+                if shift >= 35:
+                    raise ValueError("Lien invalide")
+            current.append(v)
+    except (IndexError, zlib.error, ValueError) as exc:
+        raise ValueError(exc.args[0] if str(exc).startswith(("Lien", "Version")) else "Lien invalide") from None
+    if pos != len(body) or ri >= len(RACES) or not 1 <= slot <= 18:
+        raise ValueError("Lien invalide")
+    return list(RACES)[ri], slot, current, fp != dataset_fingerprint()
+
+
+MATRIX_COLUMNS = ["race", "slot", "slot_label", "population", "index", "emoji", "building", "required"]
+DELTA_COLUMNS = ["profile", "race", "slot", "slot_label", "index", "building", "current", "required", "missing", "ok"]
+EXPORT_CHUNK = 16 * 1024
+
+
+def parse_export_profiles(items: Any) -> List[Tuple[str, int, List[int]]]:
+    if not isinstance(items, list):
+        raise ValueError("profiles doit être une liste")
+    out = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("profil invalide")
+        out.append((normalize_race(item.get("race", "humains")), parse_slot(str(item.get("slot", "1"))), levels_from_arg(item.get("current", []))))
+    return out
+
+
+def iter_matrix_rows(races: Sequence[str] | None = None) -> Iterator[Dict[str, Any]]:
+    for race in races or list(RACES):
+        cfg = RACES[race]
+        for slot in range(1, 19):
+            label, pop, row = slot_to_label(slot), POP_THRESHOLDS[slot - 1], MODELS[race].row(slot)
+            for i, (em, name) in enumerate(cfg["buildings"]):
+                yield {"race": race, "slot": slot, "slot_label": label, "population": pop, "index": i, "emoji": em, "building": name, "required": row[i]}
+
+
+def iter_delta_rows(profiles: Sequence[Tuple[str, int, List[int]]]) -> Iterator[Dict[str, Any]]:
+    for n, (race, slot, current) in enumerate(profiles):
+        res = DeltaResult(race, slot, current)
+        label = slot_to_label(slot)
+        for r in res.rows:
+            yield {
+                "profile": n,
+                "race": race,
+                "slot": slot,
+                "slot_label": label,
+                "index": r["index"],
+                "building": r["building"],
+                "current": r["current"],
+                "required": r["required"],
+                "missing": r["missing"],
+                "ok": r["ok"],
+            }
+
+
+def iter_export_chunks(rows: Iterable[Dict[str, Any]], fmt: str, columns: Sequence[str]) -> Iterator[bytes]:
+    """Encode rows as CSV or JSONL, yielding ~EXPORT_CHUNK sized byte blocks."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n") if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(columns)
+    for row in rows:
+        if writer is not None:
+            writer.writerow([row[c] for c in columns])
+        else:
+            buf.write(json.dumps(row, ensure_ascii=False))
+            buf.write("\n")
+        if buf.tell() >= EXPORT_CHUNK:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def tables_payload() -> Dict[str, Any]:
+    # Everything the page needs to mirror build_state_payload locally.
+    return {
+        "version": VERSION,
+        "population": POP_THRESHOLDS,
+        "races": {
+            k: {
+                "display": v["display"],
+                "buildings": [{"emoji": em, "name": n} for em, n in v["buildings"]],
+                "categories": [priority_category(i, n) for i, (_, n) in enumerate(v["buildings"])],
+                "levels": [MODELS[k].row(s) for s in range(1, 19)],
+            }
+            for k, v in RACES.items()
+        },
+    }
+
+
+_TABLES_CACHE: Dict[str, Tuple[bytes, str]] = {}
+
+
+def tables_body() -> Tuple[bytes, str]:
+    """Serialized tables payload and its ETag, computed once per dataset."""
+    cached = _TABLES_CACHE.get("tables")
+    if cached is None:
+        body = json.dumps(tables_payload(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        cached = (body, '"' + hashlib.sha1(body).hexdigest()[:16] + '"')
+        _TABLES_CACHE["tables"] = cached
+    return cached
+
+
 def self_test() -> Tuple[bool, List[str]]:
     errors: List[str] = []
     if len(POP_THRESHOLDS) != 18:
@@ -360,6 +1299,30 @@ def self_test() -> Tuple[bool, List[str]]:
         for s, row in enumerate(cfg["levels"], 1):
             if len(row) != len(cfg["buildings"]):
                 errors.append(f"{race}: slot {s} incohérent")
+    code = encode_link("mecas", 7, [200] * 6)  # repetitive levels: the zlib form wins
+    if base64.urlsafe_b64decode(code + "=" * (-len(code) % 4))[0] != LINK_VERSION | LINK_ZLIB or decode_link(code)[:3] != ("mecas", 7, [200] * 6):
+        errors.append("Lien de partage compressé invalide")
+    raw = [78, 43, 21, 7, 57, -2, 44]
+    if account_payload([{"race": "kaelesh", "current": raw}])["planets"][0]["autoslot"]["maxslot"] != AutoslotResult("kaelesh", raw).maxslot:
+        errors.append("Compte : autoslot différent de /api/autoslot")
+    for weights, budgets, message in (
+        (["abc"], [1], "weights doit contenir des nombres positifs"),
+        (None, ["abc"], "budget doit être un nombre positif"),
+        (None, [None], "budget doit être un nombre positif"),
+    ):
+        try:
+            optimize_payload("mecas", [], budgets, weights)
+            errors.append(f"Optimiseur : {budgets} accepté")
+        except ValueError as exc:
+            if str(exc) != message:
+                errors.append(f"Optimiseur : message inattendu ({exc})")
+    for level, message in ((None, "level requis"), ("abc", "level doit être un entier"), ("1.5", "level doit être un entier")):
+        try:
+            unlock_query("mecas", 0, level)
+            errors.append(f"Déblocage : level {level!r} accepté")
+        except ValueError as exc:
+            if str(exc) != message:
+                errors.append(f"Déblocage : message inattendu ({exc})")
     return len(errors) == 0, errors
 
 
@@ -423,10 +1386,12 @@ table{width:100%;border-collapse:collapse}th,td{padding:8px;border-bottom:1px so
 <div id='k' class='k'><div class='kbox card'><input id='kInput' placeholder='slot 18 | race mecas | theme minimal | export txt | toggle emoji'></div></div>
 <script>
 const TABS=[['min','MIN'],['delta','DELTA'],['full','FULL'],['auto','AUTO-SLOT'],['settings','SETTINGS'],['help','HELP']];
-const state={race:'humains',slot:11,tier:2,current:[],races:[],tab:'min',emoji:true,anim:true,theme:'__DEFAULT_THEME__',density:'comfortable',fontScale:100,accentAuto:true,lastProfile:''};
+const state={race:'humains',slot:11,tier:2,current:[],races:[],tab:'min',emoji:true,anim:true,theme:'__DEFAULT_THEME__',density:'comfortable',fontScale:100,accentAuto:true,lastProfile:'',localCompute:false};
 const $=s=>document.querySelector(s), $$=s=>Array.from(document.querySelectorAll(s));
 const esc=s=>String(s).replace(/[&<>]/g,m=>({'&':'&amp;','<':'&lt;','>':'&gt;'}[m]));
-async function api(u,o){const r=await fetch(u,o);if(!r.ok) throw new Error(await r.text()); return r.json();}
+const STATIC=__STATIC__;
+const STATIC_URLS={'/api/races':'api/races.json','/api/tables':'api/tables.json'};
+async function api(u,o){if(STATIC){const s=STATIC_URLS[u.split('?')[0]]; if(!s) throw new Error('Indisponible en version statique: '+u); u=s;} const r=await fetch(u,o);if(!r.ok) throw new Error(await r.text()); return r.json();}
 const slotLabel=s=>`${Math.floor((s-1)/6)+1}.${((s-1)%6)+1}`;
 function parseSlot(v){v=String(v).trim();if(/^\d+$/.test(v)){const n=+v; if(n>=1&&n<=18)return n;} const m=v.match(/^([1-3])\.([1-6])$/); if(m)return (+m[1]-1)*6+(+m[2]); return null;}
 function save(){localStorage.setItem('fdv_v09',JSON.stringify(state));}
@@ -438,13 +1403,42 @@ function applyTheme(){
   document.documentElement.style.setProperty('--dur', state.anim?'.18s':'0s');
   const r=state.races.find(x=>x.key===state.race); if(state.accentAuto && r) document.documentElement.style.setProperty('--accent',r.color);
 }
+const LINK_VERSION=1, LINK_ZLIB=0x80;
+function b64u(bytes){let s='';for(const x of bytes)s+=String.fromCharCode(x);return btoa(s).replace(/\+/g,'-').replace(/\//g,'_').replace(/=+$/,'');}
+function unb64u(t){const b=atob(t.replace(/-/g,'+').replace(/_/g,'/')+'='.repeat((4-t.length%4)%4));return Uint8Array.from(b,c=>c.charCodeAt(0));}
+function packLink(){
+  // Same layout as encode_link, never compressed: the server decodes both.
+  const ri=state.races.findIndex(r=>r.key===state.race); if(ri<0)return null;
+  const fp=state.dataset||0, out=[LINK_VERSION,(fp>>8)&255,fp&255,ri,state.slot,state.current.length];
+  for(const x of state.current){let v=Math.max(0,Math.floor(+x)||0); while(v>127){out.push((v&127)|128); v=Math.floor(v/128);} out.push(v);}
+  return b64u(out);
+}
+async function inflateLink(b){
+  // encode_link sets LINK_ZLIB when a zlib stream is shorter: inflate the body, keep the version byte.
+  if(!(b[0]&LINK_ZLIB))return b;
+  if(typeof DecompressionStream==='undefined')return null;
+  const s=new Blob([b.subarray(1)]).stream().pipeThrough(new DecompressionStream('deflate'));
+  const body=new Uint8Array(await new Response(s).arrayBuffer()), out=new Uint8Array(body.length+1);
+  out[0]=b[0]&~LINK_ZLIB; out.set(body,1); return out;
+}
+async function unpackLink(code){
+  const b=await inflateLink(unb64u(code));
+  if(!b){
+    // No DecompressionStream: let the server decode it (not available in the static build).
+    if(STATIC)return null;
+    const d=await api('/api/link?c='+encodeURIComponent(code)); return {race:d.race,slot:d.slot,current:d.rows.map(r=>r.current)};
+  }
+  if(b[0]!==LINK_VERSION)return null;
+  let p=3; const ri=b[p++], slot=b[p++], n=b[p++], cur=[];
+  for(let i=0;i<n;i++){let v=0,m=1,x; do{if(p>=b.length)return null; x=b[p++]; v+=(x&127)*m; m*=128;}while(x&128); cur.push(v);}
+  const r=state.races[ri]; return r&&slot>=1&&slot<=18?{race:r.key,slot,current:cur}:null;
+}
 function hashState(){
-  const payload={r:state.race,s:state.slot,t:state.tier,c:state.current,e:state.emoji,th:state.theme,d:state.density,f:state.fontScale};
-  const b=btoa(unescape(encodeURIComponent(JSON.stringify(payload)))).replace(/\+/g,'-').replace(/\//g,'_').replace(/=+$/,'');
-  location.hash=b;
+  const code=packLink(); if(code) location.hash='s='+code;
 }
-function restoreHash(){
+async function restoreHash(){
   const h=location.hash.slice(1); if(!h)return;
+  if(h.startsWith('s=')){try{const o=await unpackLink(h.slice(2)); if(o) Object.assign(state,o);}catch{} return;}
   try{const b=h.replace(/-/g,'+').replace(/_/g,'/');const pad='='.repeat((4-b.length%4)%4);const o=JSON.parse(decodeURIComponent(escape(atob(b+pad))));
     Object.assign(state,{race:o.r||state.race,slot:o.s||state.slot,tier:o.t||state.tier,current:o.c||state.current,emoji:o.e??state.emoji,theme:o.th||state.theme,density:o.d||state.density,fontScale:o.f||state.fontScale});
   }catch{}
@@ -459,8 +1453,7 @@ function renderPanels(){ $$('.panel').forEach(p=>p.classList.remove('on')); $(`#
 function filterTable(id,q){q=q.toLowerCase(); $$(id+' tbody tr').forEach(tr=>tr.style.display=tr.innerText.toLowerCase().includes(q)?'':'none');}
 function dl(name,txt,typ='text/plain;charset=utf-8'){const a=document.createElement('a'); a.href=URL.createObjectURL(new Blob([txt],{type:typ})); a.download=name; a.click();}
 
-async function renderMin(){
-  const d=await api(`/api/slot?r=${state.race}&slot=${state.slot}`);
+function paintMin(d){
   $('#slotPop').textContent='Population: '+new Intl.NumberFormat('fr-FR').format(d.population);
   $('#p-min').innerHTML=`<div class='card stack'><div class='row noprint'><input id='fmin' placeholder='Filtrer bâtiment'><button class='btn' id='copyMin'>Copier</button><button class='btn' id='txtMin'>TXT</button><button class='btn' id='jsonMin'>JSON</button></div><table id='tmin'><thead><tr><th>Bâtiment</th><th>Niveau</th></tr></thead><tbody>${d.requirements.map(r=>`<tr><td>${state.emoji?r.emoji+' ':''}${esc(r.building)}</td><td class='mono'>${r.required}</td></tr>`).join('')}</tbody></table></div>`;
   $('#fmin').oninput=e=>filterTable('#tmin',e.target.value);
@@ -470,12 +1463,10 @@ async function renderMin(){
   $('#jsonMin').onclick=()=>dl(`fdv_${state.race}_${d.slot_label}.json`,JSON.stringify(d,null,2),'application/json');
 }
 
-async function renderDelta(){
-  ensureCurrentLen();
-  const d=await api('/api/delta',{method:'POST',headers:{'content-type':'application/json'},body:JSON.stringify({race:state.race,slot:state.slot,current:state.current})});
+function paintDelta(d){
   $('#p-delta').innerHTML=`<div class='stack'><div class='card'><div class='sub'>Progression slot ${d.slot_label}</div><div class='progress'><div class='bar' style='width:${d.progress}%'></div></div><div class='sub'>${d.progress}% · max ${slotLabel(d.maxslot||1)} · next ${d.nextslot_label}</div></div><div class='card'><div class='row noprint'><input id='fdelta' placeholder='Filtrer'><button class='btn' id='saveProfile'>Sauver profil</button></div><table id='tdelta'><thead><tr><th>Bâtiment</th><th>Actuel</th><th>Requis</th><th>Manque</th></tr></thead><tbody>${d.rows.map((r,i)=>`<tr><td>${state.emoji?r.emoji+' ':''}${esc(r.building)}</td><td><input class='lv' data-i='${i}' value='${r.current}'></td><td class='mono'>${r.required}</td><td class='mono' style='color:${r.ok?'var(--ok)':'var(--bad)'}'>${r.missing}</td></tr>`).join('')}</tbody></table></div><div class='card'><b>Top suggestions</b><ol>${d.priority.slice(0,8).map(p=>`<li>${esc(p.building)} +${p.missing}</li>`).join('')||'<li>Tout est OK</li>'}</ol></div></div>`;
   $('#fdelta').oninput=e=>filterTable('#tdelta',e.target.value);
-  $$('.lv').forEach(i=>i.oninput=e=>{state.current[+e.target.dataset.i]=Math.max(0,parseInt(e.target.value||'0',10)||0);save();hashState();renderDelta();renderAuto();});
+  $$('.lv').forEach(i=>i.oninput=e=>{state.current[+e.target.dataset.i]=Math.max(0,parseInt(e.target.value||'0',10)||0);save();hashState();syncLive();});
   $('#saveProfile').onclick=()=>{
     const name=prompt('Nom du profil?','profil-'+new Date().toISOString().slice(0,16).replace('T',' ')); if(!name)return;
     const p=JSON.parse(localStorage.getItem('fdv_profiles')||'{}'); p[name]={race:state.race,current:state.current,savedAt:new Date().toISOString()};
@@ -483,40 +1474,121 @@ async function renderDelta(){
   };
 }
 
-async function renderFull(){
-  const d=await api(`/api/full?r=${state.race}&tier=${state.tier}`);
+function paintFull(d){
   $('#p-full').innerHTML=`<div class='card stack'><div class='row noprint'><select id='tierSel'><option ${state.tier===1?'selected':''}>1</option><option ${state.tier===2?'selected':''}>2</option><option ${state.tier===3?'selected':''}>3</option></select><input id='ffull' placeholder='Filtrer'></div><table id='tfull'><thead><tr><th>Bâtiment</th>${d.slots.map(s=>`<th>${s.label}</th>`).join('')}</tr></thead><tbody>${d.matrix.map(r=>`<tr><td>${state.emoji?r.emoji+' ':''}${esc(r.building)}</td>${r.values.map(v=>`<td class='mono'>${v}</td>`).join('')}</tr>`).join('')}</tbody></table></div>`;
-  $('#tierSel').onchange=e=>{state.tier=+e.target.value; save(); hashState(); renderFull();};
+  $('#tierSel').onchange=e=>{state.tier=+e.target.value; save(); hashState(); syncLive();};
   $('#ffull').oninput=e=>filterTable('#tfull',e.target.value);
 }
 
-async function renderAuto(){
-  ensureCurrentLen();
-  const d=await api('/api/autoslot',{method:'POST',headers:{'content-type':'application/json'},body:JSON.stringify({race:state.race,current:state.current})});
+function paintAuto(d){
   $('#p-auto').innerHTML=`<div class='stack'><div class='card'><div class='sub'>Slot max atteignable</div><div class='mono' style='font-size:22px'>${slotLabel(d.maxslot||1)}</div><div class='sub'>Prochain conseillé: ${slotLabel(d.nextslot)}</div></div><div class='card'><b>Delta auto vers ${slotLabel(d.nextslot)}</b><ul>${d.deltaNext.priority.slice(0,10).map(x=>`<li>${esc(x.building)} +${x.missing}</li>`).join('')||'<li>Aucun manque</li>'}</ul></div></div>`;
 }
 
 function renderSettings(){
   const profiles=JSON.parse(localStorage.getItem('fdv_profiles')||'{}');
-  $('#p-settings').innerHTML=`<div class='stack'><div class='card stack'><label><input id='emoji' type='checkbox' ${state.emoji?'checked':''}> Emojis ON</label><label><input id='anim' type='checkbox' ${state.anim?'checked':''}> Animations ON</label><label>Theme<select id='theme'><option value='neon' ${state.theme==='neon'?'selected':''}>Neon HUD</option><option value='minimal' ${state.theme==='minimal'?'selected':''}>Minimal</option><option value='contrast' ${state.theme==='contrast'?'selected':''}>High Contrast</option></select></label><label>Font scale<input id='fs' type='range' min='90' max='120' value='${state.fontScale}'></label><label>Density<select id='density'><option value='comfortable' ${state.density==='comfortable'?'selected':''}>comfortable</option><option value='compact' ${state.density==='compact'?'selected':''}>compact</option></select></label><label><input id='accentAuto' type='checkbox' ${state.accentAuto?'checked':''}> Accent auto par race</label></div><div class='card'><b>Profils</b><div class='sub'>Auto-restore: ${state.lastProfile||'aucun'}</div>${Object.keys(profiles).map(k=>`<div class='row'><button class='btn lp' data-k='${esc(k)}'>Charger ${esc(k)}</button><button class='btn dp' data-k='${esc(k)}'>Suppr</button></div>`).join('')||'<div class="sub">Aucun profil</div>'}</div></div>`;
+  $('#p-settings').innerHTML=`<div class='stack'><div class='card stack'><label><input id='emoji' type='checkbox' ${state.emoji?'checked':''}> Emojis ON</label><label><input id='anim' type='checkbox' ${state.anim?'checked':''}> Animations ON</label><label>Theme<select id='theme'><option value='neon' ${state.theme==='neon'?'selected':''}>Neon HUD</option><option value='minimal' ${state.theme==='minimal'?'selected':''}>Minimal</option><option value='contrast' ${state.theme==='contrast'?'selected':''}>High Contrast</option></select></label><label>Font scale<input id='fs' type='range' min='90' max='120' value='${state.fontScale}'></label><label>Density<select id='density'><option value='comfortable' ${state.density==='comfortable'?'selected':''}>comfortable</option><option value='compact' ${state.density==='compact'?'selected':''}>compact</option></select></label><label><input id='accentAuto' type='checkbox' ${state.accentAuto?'checked':''}> Accent auto par race</label><label><input id='localCompute' type='checkbox' ${state.localCompute?'checked':''}> Calcul local (tables chargées une fois)</label></div><div class='card'><b>Profils</b><div class='sub'>Auto-restore: ${state.lastProfile||'aucun'}</div>${Object.keys(profiles).map(k=>`<div class='row'><button class='btn lp' data-k='${esc(k)}'>Charger ${esc(k)}</button><button class='btn dp' data-k='${esc(k)}'>Suppr</button></div>`).join('')||'<div class="sub">Aucun profil</div>'}</div></div>`;
   $('#emoji').onchange=e=>{state.emoji=e.target.checked;save();renderAll();};
   $('#anim').onchange=e=>{state.anim=e.target.checked;applyTheme();save();};
   $('#theme').onchange=e=>{state.theme=e.target.value;applyTheme();save();};
   $('#fs').oninput=e=>{state.fontScale=+e.target.value;applyTheme();save();};
   $('#density').onchange=e=>{state.density=e.target.value;applyTheme();save();};
   $('#accentAuto').onchange=e=>{state.accentAuto=e.target.checked;applyTheme();save();};
+  $('#localCompute').onchange=e=>{state.localCompute=e.target.checked;save();renderState();};
   $$('.lp').forEach(b=>b.onclick=()=>{const p=profiles[b.dataset.k]; state.race=p.race; state.current=p.current; state.lastProfile=b.dataset.k; save(); applyTheme(); renderAll();});
   $$('.dp').forEach(b=>b.onclick=()=>{delete profiles[b.dataset.k]; localStorage.setItem('fdv_profiles',JSON.stringify(profiles)); renderSettings();});
 }
 
 function renderHelp(){
-  $('#p-help').innerHTML=`<div class='card stack'><b>Raccourcis</b><ul><li>1..4: race</li><li>←/→: slot -/+</li><li>Ctrl+K: command palette</li></ul><b>Commandes palette</b><ul><li>slot 18</li><li>race mecas</li><li>theme minimal</li><li>export txt / export json</li><li>toggle emoji</li></ul></div>`;
+  $('#p-help').innerHTML=`<div class='card stack'><b>Raccourcis</b><ul><li>1..4: race</li><li>←/→: slot -/+</li><li>Ctrl+K: command palette</li></ul><b>Commandes palette</b><ul><li>slot 18</li><li>race mecas</li><li>theme minimal</li><li>export txt / export json</li><li>export csv / export jsonl (toutes les tables)</li><li>toggle emoji</li></ul></div>`;
+}
+
+function localLevels(text,n){const out=Array(n).fill(0); (String(text).match(/\d+/g)||[]).slice(0,n).forEach((v,i)=>out[i]=+v); return out;}
+function localExport(fmt){
+  const t=tables.races[state.race], d=lState(state.race,state.slot,state.tier,state.current).delta;
+  if(fmt==='json') return d;
+  return {format:'txt',text:[`[FDV] ${t.display} slot ${d.slot_label}`,`Population: ${d.population}`,...d.rows.map(r=>`- ${r.building}: actuel ${r.current} / requis ${r.required} / manque ${r.missing}`)].join('\n')};
+}
+
+const MATRIX_COLUMNS=['race','slot','slot_label','population','index','emoji','building','required'];
+function localMatrix(fmt){
+  // Same rows and columns as /api/export/stream?kind=matrix, built from the tables.
+  const rows=[];
+  for(const [race,t] of Object.entries(tables.races)) for(let s=1;s<=18;s++) t.buildings.forEach((b,i)=>rows.push({race,slot:s,slot_label:slotLabel(s),population:tables.population[s-1],index:i,emoji:b.emoji,building:b.name,required:t.levels[s-1][i]}));
+  if(fmt==='jsonl') return rows.map(r=>JSON.stringify(r)+'\n').join('');
+  const cell=v=>{v=String(v); return /[",\n\r]/.test(v)?'"'+v.replace(/"/g,'""')+'"':v;};
+  return [MATRIX_COLUMNS,...rows.map(r=>MATRIX_COLUMNS.map(k=>r[k]))].map(r=>r.map(cell).join(',')+'\n').join('');
 }
 
 async function applyImport(){
   const text=$('#importBox').value||'';
+  if(STATIC){ensureCurrentLen(); state.current=localLevels(text,state.current.length); save(); hashState(); syncLive(); return;}
   const d=await api('/api/parse-levels',{method:'POST',headers:{'content-type':'application/json'},body:JSON.stringify({race:state.race,text})});
-  state.current=d.current; save(); hashState(); renderDelta(); renderAuto();
+  state.current=d.current; save(); hashState(); syncLive();
+}
+
+// Local mirror of build_state_payload, fed by /api/tables (opt-in: Settings or ?local=1).
+let tables=null;
+async function loadTables(){ if(!tables){ try{tables=await api('/api/tables');}catch{tables=null;} } return tables; }
+function lMaxSlot(t,cur){let mx=0; for(let s=1;s<=18;s++){const req=t.levels[s-1]; if(req.every((v,i)=>(cur[i]||0)>=v)) mx=s; else break;} return mx;}
+function lPriority(t,miss){
+  const ranked=[]; miss.forEach((m,i)=>{if(m>0) ranked.push([t.categories[i],-m,i]);});
+  ranked.sort((a,b)=>a[0]-b[0]||a[1]-b[1]||a[2]-b[2]);
+  return ranked.map(([c,,i])=>({index:i,building:t.buildings[i].name,missing:miss[i],category:c}));
+}
+function lDelta(race,t,slot,cur,maxslot){
+  const req=t.levels[slot-1], miss=req.map((v,i)=>Math.max(0,v-cur[i])), ok=miss.filter(m=>m===0).length;
+  const nextslot=maxslot<18?Math.min(18,maxslot+1):18;
+  return {race,slot,slot_label:slotLabel(slot),population:tables.population[slot-1],
+    rows:req.map((v,i)=>({index:i,emoji:t.buildings[i].emoji,building:t.buildings[i].name,current:cur[i],required:v,missing:miss[i],ok:miss[i]===0})),
+    priority:lPriority(t,miss),progress:req.length?Math.floor(ok/req.length*100):0,maxslot,nextslot,nextslot_label:slotLabel(nextslot)};
+}
+function lState(race,slot,tier,current){
+  const t=tables.races[race], pop=tables.population, n=t.buildings.length;
+  const cur=Array.from({length:n},(_,i)=>Math.max(0,parseInt(current[i]||0,10)||0));
+  const raw=Array.from({length:n},(_,i)=>parseInt(current[i]||0,10)||0);
+  const maxslot=lMaxSlot(t,raw), nextslot=maxslot<18?Math.min(18,maxslot+1):18, clampedMax=lMaxSlot(t,cur);
+  const delta=lDelta(race,t,slot,cur,clampedMax), start=(tier-1)*6+1, slots=[0,1,2,3,4,5].map(k=>start+k);
+  return {race,
+    slot:{race,display:t.display,slot,slot_label:slotLabel(slot),population:pop[slot-1],requirements:t.buildings.map((b,i)=>({index:i,emoji:b.emoji,building:b.name,required:t.levels[slot-1][i]}))},
+    delta,
+    full:{race,tier,slots:slots.map(s=>({slot:s,label:slotLabel(s),population:pop[s-1]})),matrix:t.buildings.map((b,i)=>({index:i,emoji:b.emoji,building:b.name,values:slots.map(s=>t.levels[s-1][i])}))},
+    auto:{race,maxslot,nextslot,deltaNext:nextslot===slot?delta:lDelta(race,t,nextslot,cur,clampedMax)}};
+}
+
+function paintState(st){paintMin(st.slot); paintDelta(st.delta); paintFull(st.full); paintAuto(st.auto);}
+async function renderState(){
+  ensureCurrentLen();
+  if(state.localCompute && await loadTables()){ paintState(lState(state.race,state.slot,state.tier,state.current)); return; }
+  let st;
+  try{ st=await api('/api/state',{method:'POST',headers:{'content-type':'application/json'},body:JSON.stringify({race:state.race,slot:state.slot,tier:state.tier,current:state.current})}); }
+  catch(e){
+    // Offline (fetch rejects with TypeError): compute from the tables the service worker precached.
+    if(e instanceof TypeError && await loadTables()){ paintState(lState(state.race,state.slot,state.tier,state.current)); return; }
+    throw e;
+  }
+  paintState(st);
+}
+
+let live=null, liveId=null, liveRetry=0, editedAt=0;
+function subscribeLive(){
+  if(!window.EventSource||live||state.localCompute)return;
+  ensureCurrentLen();
+  const q=new URLSearchParams({race:state.race,slot:String(state.slot),tier:String(state.tier),current:state.current.join(','),t:String(editedAt)}); const ch=localStorage.getItem('fdv_live_channel'); if(ch) q.set('channel',ch);
+  live=new EventSource('/api/events?'+q.toString());
+  live.addEventListener('hello',e=>{const h=JSON.parse(e.data); liveId=h.id; localStorage.setItem('fdv_live_channel',h.channel);});
+  live.addEventListener('state',e=>{const d=JSON.parse(e.data); const p=d.profile;
+    // A push older than our last edit (a channel's stored profile after a reconnect) must not revert it: re-send ours.
+    if((p.t||0)<editedAt){ if(liveId) syncLive(); return; }
+    if(p.race!==state.race)return; state.current=p.current; state.slot=p.slot; state.tier=p.tier; paintState(d);});
+  // The browser would reconnect with the page-load URL: rebuild the stream from the current state instead.
+  live.onerror=()=>{live.close(); live=null; liveId=null; clearTimeout(liveRetry); liveRetry=setTimeout(subscribeLive,3000);};
+}
+async function syncLive(){
+  ensureCurrentLen();
+  editedAt=Date.now();
+  if(state.localCompute){ await renderState(); return; }
+  if(liveId){try{await api('/api/events/profile',{method:'POST',headers:{'content-type':'application/json'},body:JSON.stringify({id:liveId,race:state.race,slot:state.slot,tier:state.tier,current:state.current,t:editedAt})});return;}catch{liveId=null;}}
+  await renderState();
 }
 
 function openPalette(){ $('#k').classList.add('on'); $('#kInput').focus(); }
@@ -528,6 +1600,9 @@ async function runCmd(cmd){
   else if(c.startsWith('race ')){const r=c.slice(5).trim(); state.race=r==='1'?'humains':r==='2'?'rocktal':r==='3'?'mecas':r==='4'?'kaelesh':r; save(); applyTheme(); renderAll();}
   else if(c.startsWith('theme ')){state.theme=c.slice(6).trim(); applyTheme(); save();}
   else if(c==='toggle emoji'){state.emoji=!state.emoji; save(); renderAll();}
+  else if(STATIC&&(c==='export csv'||c==='export jsonl')){await loadTables(); const f=c.slice(7); dl(`fdv_matrix.${f}`,localMatrix(f),f==='csv'?'text/csv;charset=utf-8':'application/x-ndjson;charset=utf-8');}
+  else if(STATIC&&(c==='export txt'||c==='export json')){await loadTables(); const f=c.slice(7).trim(), d=localExport(f); if(f==='json') dl('fdv_export.json',JSON.stringify(d,null,2),'application/json'); else dl('fdv_export.txt',d.text);}
+  else if(c==='export csv'||c==='export jsonl'){location.href=`/api/export/stream?kind=matrix&format=${c.slice(7)}`;}
   else if(c==='export txt'){const d=await api(`/api/export?format=txt&race=${encodeURIComponent(state.race)}&slot=${state.slot}&current=${encodeURIComponent(state.current.join(','))}`); dl('fdv_export.txt',d.text);}
   else if(c==='export json'){const d=await api(`/api/export?format=json&race=${encodeURIComponent(state.race)}&slot=${state.slot}&current=${encodeURIComponent(state.current.join(','))}`); dl('fdv_export.json',JSON.stringify(d,null,2),'application/json');}
   else if(c==='help'){state.tab='help'; renderTabs(); renderPanels();}
@@ -536,18 +1611,19 @@ async function runCmd(cmd){
 async function renderAll(){
   ensureCurrentLen();
   raceCards(); renderTabs(); renderPanels(); applyTheme();
-  await renderMin(); await renderDelta(); await renderFull(); await renderAuto(); renderSettings(); renderHelp();
+  await renderState(); renderSettings(); renderHelp();
   $('#slotText').value=slotLabel(state.slot); $('#slotRange').value=String(state.slot);
 }
 
 async function boot(){
-  load(); const r=await api('/api/races'); state.races=r.races; restoreHash(); ensureCurrentLen();
+  load(); const r=await api('/api/races'); state.races=r.races; state.dataset=r.dataset; await restoreHash(); ensureCurrentLen();
+  if(STATIC||new URLSearchParams(location.search).get('local')==='1') state.localCompute=true;
   const profiles=JSON.parse(localStorage.getItem('fdv_profiles')||'{}'); if(state.lastProfile && profiles[state.lastProfile]){state.race=profiles[state.lastProfile].race;state.current=profiles[state.lastProfile].current||state.current;}
   applyTheme();
-  $('#slotRange').oninput=e=>{state.slot=+e.target.value; $('#slotText').value=slotLabel(state.slot); save(); hashState(); renderMin(); renderDelta();};
-  $('#slotText').onchange=e=>{const s=parseSlot(e.target.value); if(s){state.slot=s; $('#slotRange').value=String(s); save(); hashState(); renderMin(); renderDelta();}};
+  $('#slotRange').oninput=e=>{state.slot=+e.target.value; $('#slotText').value=slotLabel(state.slot); save(); hashState(); syncLive();};
+  $('#slotText').onchange=e=>{const s=parseSlot(e.target.value); if(s){state.slot=s; $('#slotRange').value=String(s); save(); hashState(); syncLive();}};
   $('#importApply').onclick=applyImport;
-  $('#clearLv').onclick=()=>{ensureCurrentLen(); state.current=state.current.map(()=>0); save(); hashState(); renderDelta(); renderAuto();};
+  $('#clearLv').onclick=()=>{ensureCurrentLen(); state.current=state.current.map(()=>0); save(); hashState(); syncLive();};
   $('#copyLink').onclick=()=>{hashState(); navigator.clipboard.writeText(location.href).then(()=>alert('Lien copié'));};
   $('#openCmd').onclick=openPalette;
   $('#k').onclick=e=>{if(e.target.id==='k')closePalette();};
@@ -555,25 +1631,424 @@ async function boot(){
   document.addEventListener('keydown',e=>{
     if(e.ctrlKey&&e.key.toLowerCase()==='k'){e.preventDefault();openPalette();}
     if(['1','2','3','4'].includes(e.key)){state.race=['humains','rocktal','mecas','kaelesh'][+e.key-1]; applyTheme(); save(); renderAll();}
-    if(e.key==='ArrowLeft'){state.slot=Math.max(1,state.slot-1); save(); hashState(); renderMin(); renderDelta();}
-    if(e.key==='ArrowRight'){state.slot=Math.min(18,state.slot+1); save(); hashState(); renderMin(); renderDelta();}
+    if(e.key==='ArrowLeft'){state.slot=Math.max(1,state.slot-1); save(); hashState(); syncLive();}
+    if(e.key==='ArrowRight'){state.slot=Math.min(18,state.slot+1); save(); hashState(); syncLive();}
   });
   await renderAll();
+  subscribeLive();
+  if('serviceWorker' in navigator) navigator.serviceWorker.register('./sw.js').catch(()=>{});
 }
 boot();
 </script>
 </body></html>"""
 
+SW_JS = r"""// FDV service worker: precache page + tables, serve from cache, revalidate in background.
+const CACHE='fdv-__VERSION__';
+const PRECACHE=__PRECACHE__.map(p=>new URL(p,self.registration.scope).pathname);
+self.addEventListener('install',e=>{e.waitUntil(caches.open(CACHE).then(c=>c.addAll(PRECACHE)).then(()=>self.skipWaiting()));});
+self.addEventListener('activate',e=>{e.waitUntil(caches.keys().then(ks=>Promise.all(ks.filter(k=>k.startsWith('fdv-')&&k!==CACHE).map(k=>caches.delete(k)))).then(()=>self.clients.claim()));});
+self.addEventListener('fetch',e=>{
+  const u=new URL(e.request.url);
+  if(e.request.method!=='GET'||u.origin!==location.origin||!PRECACHE.includes(u.pathname))return;
+  e.respondWith(caches.open(CACHE).then(async c=>{
+    const hit=await c.match(u.pathname);
+    const net=fetch(e.request).then(r=>{if(r.ok)c.put(u.pathname,r.clone());return r;});
+    if(hit){e.waitUntil(net.catch(()=>{}));return hit;}
+    return net;
+  }));
+});
+"""
+
+
+SSE_HEARTBEAT = 15.0
+SSE_MAX_PER_CLIENT = 4
+SSE_MAX_BUFFER = 256 * 1024
+
+
+def render_page(static: bool = False) -> str:
+    return (
+        HTML_PAGE.replace("__TITLE__", TITLE)
+        .replace("__DEFAULT_THEME__", DEFAULT_THEME)
+        .replace("__STATIC__", "true" if static else "false")
+    )
+
+
+def render_sw(static: bool = False) -> str:
+    precache = ["./", "api/races.json", "api/tables.json"] if static else ["/", "/api/races", "/api/tables"]
+    return SW_JS.replace("__VERSION__", VERSION).replace("__PRECACHE__", json.dumps(precache))
+
+
+def build_static(out_dir: str, gzip_files: bool = False) -> Dict[str, Any]:
+    """Write the page and every read-only payload as files, plus a manifest.json."""
+    root = Path(out_dir)
+    files: List[Dict[str, Any]] = []
+
+    def emit(rel: str, body: bytes) -> None:
+        target = root / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(body)
+        entry: Dict[str, Any] = {"path": rel, "bytes": len(body), "sha256": hashlib.sha256(body).hexdigest()}
+        if gzip_files:
+            gz = gzip.compress(body, 9, mtime=0)
+            (root / (rel + ".gz")).write_bytes(gz)
+            entry["gzip_bytes"] = len(gz)
+        files.append(entry)
+
+    def emit_json(rel: str, payload: Any) -> None:
+        emit(rel, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    emit("index.html", render_page(static=True).encode("utf-8"))
+    emit("sw.js", render_sw(static=True).encode("utf-8"))
+    emit_json("api/races.json", races_payload())
+    emit("api/tables.json", tables_body()[0])
+    for race in RACES:
+        for slot in range(1, 19):
+            emit_json(f"api/slot/{race}/{slot}.json", build_slot_payload(race, slot))
+        for tier in (1, 2, 3):
+            emit_json(f"api/full/{race}/{tier}.json", build_full_payload(race, tier))
+    manifest = {"title": TITLE, "version": VERSION, "generated": datetime.now().isoformat(timespec="seconds"), "files": files}
+    (root / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return manifest
+
+
+class _Subscriber:
+    __slots__ = ("id", "sock", "client", "channel", "out", "last_write", "active")
+
+    def __init__(self, sid: str, sock: socket.socket, client: str, channel: str) -> None:
+        self.id = sid
+        self.sock = sock
+        self.client = client
+        self.channel = channel
+        self.out = bytearray()
+        self.last_write = time.monotonic()
+        self.active = False
+
+
+def edit_stamp(value: Any) -> int:
+    """Client edit time (ms) carried by a live profile; anything else reads as 0, the oldest."""
+    text = str(value if value is not None else "")
+    return int(text) if text.isdigit() else 0
+
+
+class EventHub:
+    """SSE subscribers served by one selector thread (no thread per idle client)."""
+
+    def __init__(self, heartbeat: float = SSE_HEARTBEAT, max_per_client: int = SSE_MAX_PER_CLIENT) -> None:
+        self.heartbeat = heartbeat
+        self.max_per_client = max_per_client
+        self._lock = threading.Lock()
+        self._subs: Dict[str, _Subscriber] = {}
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        self._sel: selectors.BaseSelector | None = None
+        self._wake_r: socket.socket | None = None
+        self._wake_w: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        self._sel = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+        self._thread = threading.Thread(target=self._loop, name="fdv-events", daemon=True)
+        self._thread.start()
+
+    def _wake(self) -> None:
+        try:
+            if self._wake_w is not None:
+                self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    @staticmethod
+    def _event(name: str, data: Any, eid: int | None = None) -> bytes:
+        head = f"id: {eid}\n" if eid is not None else ""
+        return f"{head}event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+    @staticmethod
+    def _compute(profile: Dict[str, Any]) -> Dict[str, Any]:
+        payload = build_state_payload(profile["race"], profile["slot"], profile.get("tier", 1), profile["current"])
+        payload["profile"] = profile
+        return payload
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def subscribe(self, sock: socket.socket, client: str, channel: str | None, profile: Dict[str, Any]) -> str:
+        """Reserve a stream for ``client``; call :meth:`attach` once the headers are sent."""
+        with self._lock:
+            if self.max_per_client and sum(1 for s in self._subs.values() if s.client == client) >= self.max_per_client:
+                raise LookupError(f"Trop de flux ouverts pour {client} (max {self.max_per_client})")
+            self._start()
+            # Ids double as the key for POST /api/events/profile: never guessable.
+            sid = secrets.token_urlsafe(12)
+            # Channels are server-issued tokens: a client can only join one it was handed (another tab,
+            # a shared token), never name one. An unknown or expired token opens a fresh channel.
+            chan = channel if channel in self._profiles else secrets.token_urlsafe(12)
+            if chan not in self._profiles:
+                self._profiles[chan] = profile
+            self._subs[sid] = _Subscriber(sid, sock, client, chan)
+        return sid
+
+    def attach(self, sid: str) -> None:
+        with self._lock:
+            sub = self._subs[sid]
+            snapshot = self._profiles[sub.channel]
+        state = self._event("state", self._compute(snapshot), self._next_id())
+        with self._lock:
+            if sid not in self._subs:
+                return
+            sub.sock.setblocking(False)
+            sub.out += b"retry: 3000\n\n"
+            sub.out += self._event("hello", {"id": sid, "channel": sub.channel, "heartbeat": self.heartbeat})
+            sub.active = True
+            assert self._sel is not None
+            self._sel.register(sub.sock, selectors.EVENT_READ, sid)
+            self._queue(sub, state)
+        self._wake()
+
+    def cancel(self, sid: str) -> None:
+        with self._lock:
+            sub = self._subs.pop(sid, None)
+            if sub is not None and not any(s.channel == sub.channel for s in self._subs.values()):
+                self._profiles.pop(sub.channel, None)
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def update(self, sid: str, profile: Dict[str, Any]) -> int:
+        with self._lock:
+            sub = self._subs.get(sid)
+            if sub is None:
+                raise KeyError("Abonnement inconnu")
+        # Compute before storing: an invalid profile must not replace the channel's last good one.
+        msg = self._event("state", self._compute(profile), self._next_id())
+        with self._lock:
+            self._profiles[sub.channel] = profile
+        return self._broadcast(sub.channel, msg)
+
+    def _broadcast(self, channel: str, msg: bytes) -> int:
+        n = 0
+        with self._lock:
+            for sub in list(self._subs.values()):
+                if sub.channel == channel:
+                    self._queue(sub, msg)
+                    n += 1
+        self._wake()
+        return n
+
+    def _queue(self, sub: _Subscriber, msg: bytes) -> None:
+        if len(sub.out) + len(msg) > SSE_MAX_BUFFER:
+            self._drop(sub)
+            return
+        sub.out += msg
+        if sub.active and self._sel is not None:
+            try:
+                self._sel.modify(sub.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, sub.id)
+            except (KeyError, ValueError):
+                pass
+
+    def _drop(self, sub: _Subscriber) -> None:
+        self._subs.pop(sub.id, None)
+        if sub.active and self._sel is not None:
+            try:
+                self._sel.unregister(sub.sock)
+            except (KeyError, ValueError):
+                pass
+        try:
+            sub.sock.close()
+        except OSError:
+            pass
+        if not any(s.channel == sub.channel for s in self._subs.values()):
+            self._profiles.pop(sub.channel, None)
+
+    def close_all(self) -> None:
+        with self._lock:
+            for sub in list(self._subs.values()):
+                self._drop(sub)
+
+    def _flush(self, sub: _Subscriber) -> None:
+        try:
+            sent = sub.sock.send(sub.out)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._drop(sub)
+            return
+        del sub.out[:sent]
+        sub.last_write = time.monotonic()
+        if self._sel is not None:
+            mask = selectors.EVENT_READ | (selectors.EVENT_WRITE if sub.out else 0)
+            self._sel.modify(sub.sock, mask, sub.id)
+
+    def _loop(self) -> None:
+        assert self._sel is not None and self._wake_r is not None
+        while True:
+            events = self._sel.select(timeout=min(1.0, self.heartbeat))
+            with self._lock:
+                for key, mask in events:
+                    if key.data is None:
+                        try:
+                            self._wake_r.recv(4096)
+                        except OSError:
+                            pass
+                        continue
+                    sub = self._subs.get(key.data)
+                    if sub is None:
+                        continue
+                    if mask & selectors.EVENT_READ:
+                        try:
+                            if not sub.sock.recv(4096):
+                                self._drop(sub)
+                                continue
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                        except OSError:
+                            self._drop(sub)
+                            continue
+                    if mask & selectors.EVENT_WRITE and sub.out:
+                        self._flush(sub)
+                now = time.monotonic()
+                for sub in list(self._subs.values()):
+                    if sub.active and not sub.out and now - sub.last_write >= self.heartbeat:
+                        sub.out += b": ping\n\n"
+                        self._flush(sub)
+
+
+EVENTS = EventHub()
+
+
+class AccessLog:
+    """Structured access log (JSON lines) written in batches by a background thread.
+
+    Handlers only append to a deque (atomic under the GIL, no lock taken). Past
+    ``high_water`` queued entries, only one request in ``sample`` is kept and the
+    kept entry carries ``"sample": N`` so totals can be scaled back.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        backups: int = 3,
+        sample: int = 10,
+        high_water: int = 5000,
+        interval: float = 0.5,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample = max(1, sample)
+        self.high_water = high_water
+        self.interval = interval
+        self.written = self.dropped = 0
+        self._queue: deque = deque()
+        self._tick = 0
+        self._stop = threading.Event()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "ab")
+        self._thread = threading.Thread(target=self._run, name="fdv-access-log", daemon=True)
+        self._thread.start()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        if len(self._queue) >= self.high_water:
+            self._tick += 1
+            if self._tick % self.sample:
+                self.dropped += 1
+                return
+            entry["sample"] = self.sample
+        self._queue.append(entry)
+
+    def _rotate(self) -> None:
+        self._fh.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                src.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            self.path.replace(self.path.with_name(self.path.name + ".1"))
+        else:
+            self.path.unlink()
+        self._fh = open(self.path, "ab")
+
+    def _drain(self) -> None:
+        lines = []
+        q = self._queue
+        while q:
+            lines.append(json.dumps(q.popleft(), ensure_ascii=False, separators=(",", ":")))
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        if self.max_bytes and self._fh.tell() + len(data) > self.max_bytes and self._fh.tell() > 0:
+            self._rotate()
+        self._fh.write(data)
+        self._fh.flush()
+        self.written += len(lines)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._drain()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self._drain()
+        self._fh.close()
+
+
+ACCESS_LOG: AccessLog | None = None
+
+
+class _CountingWriter:
+    __slots__ = ("raw", "count")
+
+    def __init__(self, raw: Any) -> None:
+        self.raw = raw
+        self.count = 0
+
+    def write(self, data: bytes) -> int:
+        self.count += len(data)
+        return self.raw.write(data)
+
+    def flush(self) -> None:
+        self.raw.flush()
+
+    def close(self) -> None:
+        self.raw.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.raw.closed
+
 
 class FdvHandler(BaseHTTPRequestHandler):
     server_version = "FDV/0.9"
+    protocol_version = "HTTP/1.1"
+    timeout = 60
+    # Headers and body go out in separate writes; with keep-alive, Nagle + delayed ACK adds ~40 ms.
+    disable_nagle_algorithm = True
 
     def _json(self, payload: Any, code: int = 200) -> None:
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._json_bytes(json.dumps(payload, ensure_ascii=False).encode("utf-8"), code)
+
+    def _json_bytes(self, body: bytes, code: int = 200, headers: Dict[str, str] | None = None) -> None:
         self.send_response(code)
         self.send_header("Content-Type", "application/json; charset=utf-8")
         self.send_header("Content-Length", str(len(body)))
         self.send_header("Cache-Control", "no-store")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if self.close_connection:
+            self.send_header("Connection", "close")
         self.end_headers()
         self.wfile.write(body)
 
@@ -585,64 +2060,258 @@ class FdvHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def _cached(self, body: bytes, etag: str, content_type: str) -> None:
+        inm = self.headers.get("If-None-Match", "")
+        if etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*":
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, chunks: Iterable[bytes], content_type: str, filename: str) -> None:
+        # HTTP/1.1 clients get chunked framing; HTTP/1.0 ones read until close.
+        chunked = self.request_version != "HTTP/1.0"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.send_header("Cache-Control", "no-store")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        for data in chunks:
+            if chunked:
+                self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+            else:
+                self.wfile.write(data)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _export_stream(self, src: Dict[str, Any]) -> None:
+        fmt = str(src.get("format", "csv")).lower()
+        if fmt not in ("csv", "jsonl"):
+            raise ValueError("format doit être csv|jsonl")
+        kind = str(src.get("kind", "matrix")).lower()
+        if kind == "matrix":
+            races = src.get("races") or src.get("race") or []
+            if isinstance(races, str):
+                races = [r for r in races.split(",") if r.strip()]
+            rows: Iterable[Dict[str, Any]] = iter_matrix_rows([normalize_race(r) for r in races])
+            columns = MATRIX_COLUMNS
+        elif kind == "delta":
+            items = src.get("profiles")
+            if items is None:
+                items = [{"race": src.get("race", "humains"), "slot": src.get("slot", "11"), "current": src.get("current", "")}]
+            rows = iter_delta_rows(parse_export_profiles(items))
+            columns = DELTA_COLUMNS
+        else:
+            raise ValueError("kind doit être matrix|delta")
+        ctype = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson; charset=utf-8"
+        try:
+            self._stream(iter_export_chunks(rows, fmt, columns), ctype, f"fdv_{kind}.{fmt}")
+        except Exception:
+            # Headers are already out: the only honest signal left is a truncated stream.
+            self.close_connection = True
+
+    def _events(self, q: Dict[str, str]) -> None:
+        race = normalize_race(q.get("race", "humains"))
+        profile = {
+            "race": race,
+            "slot": parse_slot(q.get("slot", "11")),
+            "tier": int(q.get("tier", "1")),
+            "current": levels_from_arg(q.get("current", "")),
+            "t": edit_stamp(q.get("t")),
+        }
+        EventHub._compute(profile)  # reject a bad profile while a plain 400 can still be sent
+        try:
+            sid = EVENTS.subscribe(self.connection, self._client(), q.get("channel") or None, profile)
+        except LookupError as exc:
+            self._json({"error": str(exc)}, 429)
+            return
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("X-Accel-Buffering", "no")
+            self.send_header("Connection", "close")
+            self.end_headers()
+        except OSError:
+            EVENTS.cancel(sid)
+            raise
+        self.close_connection = True
+        self.server.detach(self.connection)
+        try:
+            EVENTS.attach(sid)
+        except Exception:
+            # Headers are out and the socket is ours now: no error response, just release it.
+            EVENTS.cancel(sid)
+            try:
+                self.connection.close()
+            except OSError:
+                pass
+
+    def _client(self) -> str:
+        if getattr(self.server, "trust_proxy", False) and getattr(self, "headers", None) is not None:
+            # The right-most hop is the one our proxy appended; earlier ones are client-supplied.
+            hop = (self.headers.get("X-Forwarded-For") or "").rsplit(",", 1)[-1].strip()
+            if hop:
+                return hop
+        return self.client_address[0] if self.client_address else ""
+
     def _query(self) -> Dict[str, str]:
-        q = parse_qs(urlparse(self.path).query)
-        return {k: v[0] for k, v in q.items() if v}
+        return query_first(split_target(self.path)[1])
 
     def do_GET(self) -> None:  # noqa: N802
-        path = urlparse(self.path).path
+        path = split_target(self.path)[0]
         try:
             if path == "/":
-                self._html(HTML_PAGE.replace("__TITLE__", TITLE).replace("__DEFAULT_THEME__", DEFAULT_THEME))
+                self._html(render_page())
+            elif path == "/sw.js":
+                body = render_sw().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/javascript; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Service-Worker-Allowed", "/")
+                self.end_headers()
+                self.wfile.write(body)
             elif path == "/health":
-                self._json({"ok": True, "version": VERSION, "time": int(time.time())})
+                self._json({"ok": True, "version": VERSION, "time": int(time.time()), "subscribers": EVENTS.count(), "cache": RESULTS.stats()})
             elif path == "/version":
                 self._json({"title": TITLE, "version": VERSION})
             elif path == "/api/races":
                 self._json(races_payload())
+            elif path == "/api/tables":
+                body, etag = tables_body()
+                self._cached(body, etag, "application/json; charset=utf-8")
             elif path == "/api/slot":
                 q = self._query()
                 self._json(build_slot_payload(normalize_race(q.get("r", "humains")), parse_slot(q.get("slot", "1"))))
             elif path == "/api/full":
                 q = self._query()
                 self._json(build_full_payload(normalize_race(q.get("r", "humains")), int(q.get("tier", "1"))))
+            elif path == "/api/state":
+                q = self._query()
+                race = normalize_race(q.get("race", "humains"))
+                self._json(build_state_payload(race, parse_slot(q.get("slot", "11")), int(q.get("tier", "1")), levels_from_arg(q.get("current", ""))))
+            elif path == "/api/unlock":
+                q = self._query()
+                race = normalize_race(q.get("race", "humains"))
+                self._json(unlock_query(race, building_index(race, q.get("building", "")), q.get("level")))
+            elif path == "/api/link":
+                race, slot, current, stale = decode_link(self._query().get("c", ""))
+                self._json_bytes(delta_json(race, slot, current), headers={"X-FDV-Dataset": "stale" if stale else "current"})
+            elif path == "/api/events":
+                self._events(self._query())
+            elif path == "/api/export/stream":
+                self._export_stream(self._query())
             elif path == "/api/export":
                 q = self._query()
                 race = normalize_race(q.get("race", "humains"))
                 slot = parse_slot(q.get("slot", "11"))
                 fmt = q.get("format", "txt").lower()
-                current = [int(x) for x in re.findall(r"\d+", q.get("current", ""))]
-                payload = build_delta_payload(race, slot, current)
-                if fmt == "json":
-                    self._json(payload)
-                else:
-                    text = [f"[FDV] {RACES[race]['display']} slot {payload['slot_label']}"]
-                    text.append(f"Population: {payload['population']}")
-                    text.extend([f"- {r['building']}: actuel {r['current']} / requis {r['required']} / manque {r['missing']}" for r in payload["rows"]])
-                    self._json({"format": "txt", "text": "\n".join(text)})
+                current = int_vector(q.get("current", ""))
+                self._json_bytes(export_json(race, slot, current, "json" if fmt == "json" else "txt"))
             else:
                 self._json({"error": "Not found"}, 404)
         except Exception as exc:
             self._json({"error": str(exc)}, 400)
 
+    def _read_body(self) -> bytes:
+        # Keep-alive: body bytes left unread would be parsed as the next request, so any
+        # body we cannot drain exactly ends the connection after this response.
+        keep = not self.close_connection
+        self.close_connection = True
+        raw = self.headers.get("Content-Length", "")
+        if not raw.isdigit():
+            raise ValueError("Content-Length invalide")
+        body = self.rfile.read(int(raw))
+        if len(body) < int(raw):
+            raise ValueError("Corps de requête incomplet")
+        self.close_connection = not keep
+        return body
+
     def do_POST(self) -> None:  # noqa: N802
-        path = urlparse(self.path).path
+        path = split_target(self.path)[0]
+        if self.headers.get("Content-Length") is None:
+            # Chunked or unframed bodies are not supported: nothing tells where the next request starts.
+            self.close_connection = True
+            self._json({"error": "Content-Length requis"}, 411)
+            return
         try:
-            ln = int(self.headers.get("Content-Length", "0"))
-            data = json.loads((self.rfile.read(ln) or b"{}").decode("utf-8"))
+            data = json.loads((self._read_body() or b"{}").decode("utf-8"))
             if path == "/api/delta":
                 race = normalize_race(data.get("race", "humains"))
                 slot = parse_slot(str(data.get("slot", "1")))
                 current = data.get("current", [])
                 if not isinstance(current, list):
                     raise ValueError("current doit être une liste")
-                self._json(build_delta_payload(race, slot, current))
+                self._json_bytes(delta_json(race, slot, current))
             elif path == "/api/autoslot":
                 race = normalize_race(data.get("race", "humains"))
                 current = data.get("current", [])
                 if not isinstance(current, list):
                     raise ValueError("current doit être une liste")
-                self._json(build_autoslot_payload(race, current))
+                self._json_bytes(autoslot_json(race, current))
+            elif path == "/api/state":
+                race = normalize_race(data.get("race", "humains"))
+                current = data.get("current", [])
+                if not isinstance(current, list):
+                    raise ValueError("current doit être une liste")
+                self._json(build_state_payload(race, parse_slot(str(data.get("slot", "1"))), int(data.get("tier", 1)), current))
+            elif path == "/api/link":
+                race = normalize_race(data.get("race", "humains"))
+                slot = parse_slot(str(data.get("slot", "1")))
+                code = encode_link(race, slot, levels_from_arg(data.get("current", [])))
+                self._json({"code": code, "path": "/api/link?c=" + code, "hash": "#s=" + code})
+            elif path == "/api/optimize":
+                race = normalize_race(data.get("race", "humains"))
+                current = levels_from_arg(data.get("current", []))
+                if "budgets" in data:
+                    if not isinstance(data["budgets"], list):
+                        raise ValueError("budgets doit être une liste")
+                    budgets, plan = data["budgets"], bool(data.get("plan", False))
+                else:
+                    budgets, plan = [data.get("budget", 0)], bool(data.get("plan", True))
+                time_budget = _number(data.get("time_budget_ms", OPTIMIZE_TIME_BUDGET_MS), "time_budget_ms doit être un nombre")
+                self._json(optimize_payload(race, current, budgets, data.get("weights"), plan, time_budget))
+            elif path == "/api/account":
+                planets = data.get("planets", [])
+                if not isinstance(planets, list):
+                    raise ValueError("planets doit être une liste")
+                self._json(account_payload(planets))
+            elif path == "/api/projection":
+                planets = data.get("planets", [data])
+                if not isinstance(planets, list):
+                    raise ValueError("planets doit être une liste")
+                self._json({"thresholds": POP_THRESHOLDS, "planets": project_population(planets)})
+            elif path == "/api/export/stream":
+                self._export_stream(data)
+            elif path == "/api/events/profile":
+                race = normalize_race(data.get("race", "humains"))
+                profile = {
+                    "race": race,
+                    "slot": parse_slot(str(data.get("slot", "1"))),
+                    "tier": int(data.get("tier", 1)),
+                    "current": levels_from_arg(data.get("current", [])),
+                    "t": edit_stamp(data.get("t")),
+                }
+                try:
+                    pushed = EVENTS.update(str(data.get("id", "")), profile)
+                except KeyError as exc:
+                    self._json({"error": str(exc.args[0])}, 404)
+                    return
+                self._json({"ok": True, "pushed": pushed})
             elif path == "/api/parse-levels":
                 race = normalize_race(data.get("race", "humains"))
                 text = str(data.get("text", ""))
@@ -653,25 +2322,279 @@ class FdvHandler(BaseHTTPRequestHandler):
         except Exception as exc:
             self._json({"error": str(exc)}, 400)
 
+    def setup(self) -> None:
+        if self.request.family == socket.AF_UNIX:
+            self.disable_nagle_algorithm = False  # TCP_NODELAY does not exist on a Unix socket
+        super().setup()
+        if ACCESS_LOG is not None:
+            self.wfile = _CountingWriter(self.wfile)
+
+    def parse_request(self) -> bool:
+        self._t0 = time.perf_counter()
+        self._status = 0
+        if isinstance(self.server, FdvServer):
+            self.server.mark_busy(self.connection, True)
+        if isinstance(self.wfile, _CountingWriter):
+            self.wfile.count = 0
+        # A malformed request line leaves these unset: don't log it under the previous request.
+        self.command, self.path = None, ""
+        return super().parse_request()
+
+    def handle_one_request(self) -> None:
+        self.requestline = ""
+        try:
+            super().handle_one_request()
+        finally:
+            if isinstance(self.server, FdvServer):
+                self.server.mark_busy(self.connection, False)
+                if self.server.draining:
+                    self.close_connection = True
+        log = ACCESS_LOG
+        if log is not None and self.requestline:
+            log.record({
+                "ts": round(time.time(), 3),
+                "client": self._client(),
+                "method": self.command,
+                "route": split_target(getattr(self, "path", ""))[0],
+                "status": self._status,
+                "bytes": self.wfile.count if isinstance(self.wfile, _CountingWriter) else None,
+                "ms": round((time.perf_counter() - self._t0) * 1000, 3),
+            })
+
+    def log_request(self, code: Any = "-", size: Any = "-") -> None:
+        self._status = int(code) if isinstance(code, int) else 0
+
     def log_message(self, *_: Any) -> None:
         return
 
 
+# Terminal rendering (from the v0.5 tool): emoji-aware column widths, memoized per
+# character and per cell so large reports don't redo unicodedata lookups.
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+_CHAR_WIDTH: Dict[str, int] = {}
+
+
+def char_width(ch: str) -> int:
+    w = _CHAR_WIDTH.get(ch)
+    if w is None:
+        o = ord(ch)
+        if 0xFE00 <= o <= 0xFE0F or o == 0x200D or 0x1F3FB <= o <= 0x1F3FF or unicodedata.combining(ch):
+            w = 0
+        elif (0x1F300 <= o <= 0x1FAFF) or (0x2600 <= o <= 0x27BF):
+            w = 2
+        else:
+            w = 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+        _CHAR_WIDTH[ch] = w
+    return w
+
+
+@lru_cache(maxsize=8192)
+def vwidth(s: str) -> int:
+    if "\x1b" in s:
+        s = ANSI_RE.sub("", s)
+    if s.isascii():
+        return len(s)
+    return sum(char_width(ch) for ch in s)
+
+
+def pad_cell(s: str, width: int, right: bool = False) -> str:
+    fill = " " * max(0, width - vwidth(s))
+    return fill + s if right else s + fill
+
+
+def ansi(s: str, color: str | None, bold: bool = False) -> str:
+    # color: "#rrggbb" (24-bit) or None; callers decide whether the terminal gets colors.
+    codes = ["1"] if bold else []
+    if color:
+        codes.append("38;2;%d;%d;%d" % (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)))
+    return f"\x1b[{';'.join(codes)}m{s}\x1b[0m" if codes else s
+
+
+def render_table(headers: Sequence[str], rows: Sequence[Sequence[str]], right: Sequence[bool] | None = None) -> str:
+    right = right or [False] * len(headers)
+    widths = [vwidth(h) for h in headers]
+    for row in rows:
+        for i, cell in enumerate(row):
+            w = vwidth(cell)
+            if w > widths[i]:
+                widths[i] = w
+    sep = "+" + "+".join("=" * (w + 2) for w in widths) + "+"
+    out = [sep, "| " + " | ".join(pad_cell(h, widths[i]) for i, h in enumerate(headers)) + " |", sep]
+    for row in rows:
+        out.append("| " + " | ".join(pad_cell(c, widths[i], right[i]) for i, c in enumerate(row)) + " |")
+    out.append(sep)
+    return "\n".join(out)
+
+
+def fmt_int_fr(n: int) -> str:
+    return f"{n:,}".replace(",", " ")
+
+
+def render_slot_text(race: str, slot: int, color: bool = False, show_zeros: bool = True) -> str:
+    p = build_slot_payload(race, slot)
+    title = f"{p['display']}  •  Slot {p['slot_label']}  (#{slot})"
+    rows = [(r["emoji"], r["building"], str(r["required"])) for r in p["requirements"] if show_zeros or r["required"] > 0]
+    return "\n".join([
+        ansi(title, RACES[race]["color"] if color else None, bold=color),
+        f"Population minimum : {fmt_int_fr(p['population'])}",
+        render_table(["Icône", "Bâtiment", "Niveau"], rows, [False, False, True]),
+    ])
+
+
+def render_matrix_text(races: Sequence[str] | None = None, color: bool = False) -> str:
+    blocks: List[str] = []
+    for race in races or list(RACES):
+        cfg = RACES[race]
+        blocks.append(ansi(cfg["display"], cfg["color"] if color else None, bold=color))
+        for tier in (1, 2, 3):
+            full = build_full_payload(race, tier)
+            headers = ["Icône", "Bâtiment"] + [s["label"] for s in full["slots"]]
+            rows = [[r["emoji"], r["building"]] + [str(v) for v in r["values"]] for r in full["matrix"]]
+            rows.append(["", "Population"] + [fmt_int_fr(s["population"]) for s in full["slots"]])
+            blocks.append(render_table(headers, rows, [False, False] + [True] * 6))
+        blocks.append("")
+    return "\n".join(blocks)
+
+
+def use_color() -> bool:
+    return sys.stdout.isatty() and not os.environ.get("NO_COLOR")
+
+
 def run_cli() -> int:
     print(TITLE)
     race = input("Race [humains]: ").strip() or "humains"
     slot = input("Slot [11]: ").strip() or "11"
     try:
-        payload = build_slot_payload(normalize_race(race), parse_slot(slot))
+        text = render_slot_text(normalize_race(race), parse_slot(slot), color=use_color())
     except ValueError as exc:
         print(exc)
         return 1
-    print(f"\n{payload['display']} | slot {payload['slot_label']} | pop {payload['population']}")
-    for r in payload["requirements"]:
-        print(f"- {r['building']}: {r['required']}")
+    print()
+    print(text)
     return 0
 
 
+LOADTEST_MIX = [("/", 5), ("/api/races", 10), ("/api/delta", 40), ("/api/autoslot", 35), ("/api/parse-levels", 10)]
+
+
+def _percentile(sorted_values: Sequence[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def run_loadtest(url: str, concurrency: int = 16, duration: float = 10.0, seed: int | None = None) -> Dict[str, Any]:
+    """Replay a weighted mix of page/API calls over keep-alive connections and collect latencies."""
+    target = urlparse(url if "://" in url else "http://" + url)
+    if target.scheme != "http" or not target.hostname:
+        raise ValueError("URL attendue: http://hôte:port")
+    host, port = target.hostname, target.port or 80
+    base = target.path.rstrip("/")
+
+    probe = HTTPConnection(host, port, timeout=10)
+    try:
+        probe.request("GET", base + "/api/races")
+        resp = probe.getresponse()
+        if resp.status != 200:
+            raise RuntimeError(f"/api/races a répondu {resp.status}")
+        sizes = {r["key"]: len(r["buildings"]) for r in json.loads(resp.read())["races"]}
+    except (OSError, HTTPException) as exc:
+        reason = exc.strerror if isinstance(exc, OSError) and exc.strerror else exc
+        raise RuntimeError(f"{host}:{port} injoignable ({reason})") from None
+    except (KeyError, TypeError, ValueError):
+        raise RuntimeError(f"{url} ne répond pas comme un serveur FDV") from None
+    finally:
+        probe.close()
+
+    routes = [r for r, _ in LOADTEST_MIX]
+    weights = [w for _, w in LOADTEST_MIX]
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = {r: [] for r in routes}
+    errors: Dict[str, int] = {r: 0 for r in routes}
+    deadline = time.perf_counter() + duration
+
+    def request_for(rng: random.Random, route: str) -> Tuple[str, str, bytes | None]:
+        race = rng.choice(list(sizes))
+        levels = [rng.randint(0, 80) for _ in range(sizes[race])]
+        if route == "/api/delta":
+            body = {"race": race, "slot": rng.randint(1, 18), "current": levels}
+        elif route == "/api/autoslot":
+            body = {"race": race, "current": levels}
+        elif route == "/api/parse-levels":
+            body = {"race": race, "text": ",".join(map(str, levels))}
+        else:
+            return "GET", base + route, None
+        return "POST", base + route, json.dumps(body).encode("utf-8")
+
+    def worker(n: int) -> None:
+        rng = random.Random(None if seed is None else seed + n)
+        conn = HTTPConnection(host, port, timeout=30)
+        mine: Dict[str, List[float]] = {r: [] for r in routes}
+        bad: Dict[str, int] = {r: 0 for r in routes}
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights)[0]
+            method, path, body = request_for(rng, route)
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                r = conn.getresponse()
+                r.read()
+                ok = r.status < 400
+            except (OSError, HTTPException):
+                ok = False
+                conn.close()
+                conn = HTTPConnection(host, port, timeout=30)
+            mine[route].append(time.perf_counter() - t0)
+            if not ok:
+                bad[route] += 1
+        conn.close()
+        with lock:
+            for r in routes:
+                latencies[r].extend(mine[r])
+                errors[r] += bad[r]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    def summary(values: List[float], errs: int) -> Dict[str, Any]:
+        v = sorted(values)
+        return {
+            "requests": len(v),
+            "errors": errs,
+            "p50_ms": round(_percentile(v, 50) * 1000, 2),
+            "p90_ms": round(_percentile(v, 90) * 1000, 2),
+            "p99_ms": round(_percentile(v, 99) * 1000, 2),
+            "max_ms": round((v[-1] if v else 0.0) * 1000, 2),
+        }
+
+    everything = [x for r in routes for x in latencies[r]]
+    total = summary(everything, sum(errors.values()))
+    total["elapsed_s"] = round(elapsed, 2)
+    total["rps"] = round(len(everything) / elapsed, 1) if elapsed else 0.0
+    total["error_rate"] = round(total["errors"] / len(everything), 4) if everything else 0.0
+    return {"url": url, "concurrency": concurrency, "total": total, "routes": {r: summary(latencies[r], errors[r]) for r in routes}}
+
+
+def format_loadtest_report(report: Dict[str, Any]) -> str:
+    t = report["total"]
+    head = (
+        f"{report['url']} · {report['concurrency']} connexions · {t['elapsed_s']} s\n"
+        f"{t['requests']} requêtes · {t['rps']} req/s · erreurs {t['errors']} ({t['error_rate']:.2%})"
+    )
+    rows = [[route, str(r["requests"]), str(r["errors"]), f"{r['p50_ms']:.2f}", f"{r['p90_ms']:.2f}", f"{r['p99_ms']:.2f}", f"{r['max_ms']:.2f}"]
+            for route, r in report["routes"].items()]
+    rows.append(["TOTAL", str(t["requests"]), str(t["errors"]), f"{t['p50_ms']:.2f}", f"{t['p90_ms']:.2f}", f"{t['p99_ms']:.2f}", f"{t['max_ms']:.2f}"])
+    table = render_table(["Route", "Req", "Err", "p50 ms", "p90 ms", "p99 ms", "max ms"], rows, [False] + [True] * 6)
+    return head + "\n" + table
+
+
 def ask_start(default_port: int) -> Tuple[int, bool, str]:
     print(TITLE)
     p = input(f"Port [{default_port}]: ").strip()
@@ -681,11 +2604,88 @@ def ask_start(default_port: int) -> Tuple[int, bool, str]:
     return port, auto, theme
 
 
-def bind_server(host: str, wanted_port: int, tries: int = 50) -> Tuple[ThreadingHTTPServer, int]:
+class FdvServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    unix_path: str | None = None
+    # Behind a reverse proxy every peer is the proxy: take the client from X-Forwarded-For instead.
+    trust_proxy = False
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self._detached: set = set()
+        self._detached_lock = threading.Lock()
+        self._conns: Dict[Any, bool] = {}
+        self.draining = False
+        super().__init__(*args, **kwargs)
+
+    def get_request(self) -> Tuple[Any, Any]:
+        request, client_address = self.socket.accept()
+        if not isinstance(client_address, tuple):
+            # AF_UNIX peers have no address: keep client_address[0] usable for logs and SSE limits.
+            client_address = ("unix", 0)
+        return request, client_address
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self.unix_path:
+            try:
+                os.unlink(self.unix_path)
+            except OSError:
+                pass
+
+    def process_request_thread(self, request: Any, client_address: Any) -> None:
+        with self._detached_lock:
+            self._conns[request] = False
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._detached_lock:
+                self._conns.pop(request, None)
+
+    def mark_busy(self, request: Any, busy: bool) -> None:
+        with self._detached_lock:
+            if request in self._conns:
+                self._conns[request] = busy
+
+    def active_requests(self) -> int:
+        with self._detached_lock:
+            return sum(1 for busy in self._conns.values() if busy)
+
+    def drain(self, timeout: float) -> bool:
+        """After serve_forever has stopped: let in-flight requests finish, close idle keep-alives."""
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._detached_lock:
+                idle = [r for r, busy in self._conns.items() if not busy]
+                busy_count = len(self._conns) - len(idle)
+            for request in idle:
+                try:
+                    request.shutdown(socket.SHUT_RD)
+                except OSError:
+                    pass
+            if busy_count == 0 or time.monotonic() >= deadline:
+                return busy_count == 0
+            time.sleep(0.05)
+
+    def detach(self, request: socket.socket) -> None:
+        # Ownership of the socket moves elsewhere (SSE hub): don't close it after the handler returns.
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request: Any) -> None:
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+
+def bind_server(host: str, wanted_port: int, tries: int = 50) -> Tuple[FdvServer, int]:
     last_error: Exception | None = None
     for p in range(wanted_port, wanted_port + tries + 1):
         try:
-            return ThreadingHTTPServer((host, p), FdvHandler), p
+            return FdvServer((host, p), FdvHandler), p
         except OSError as exc:
             last_error = exc
             if exc.errno != errno.EADDRINUSE:
@@ -693,20 +2693,146 @@ def bind_server(host: str, wanted_port: int, tries: int = 50) -> Tuple[Threading
     raise RuntimeError(f"Aucun port libre entre {wanted_port} et {wanted_port + tries}: {last_error}")
 
 
-def run_web(host: str, port: int, no_open: bool) -> int:
-    server, final_port = bind_server(host, port, tries=50)
-    url = f"http://{host}:{final_port}"
+LISTEN_FD_ENV = "FDV_LISTEN_FD"
+SD_LISTEN_FDS_START = 3
+
+
+def adopt_server(sock: socket.socket, unix_path: str | None = None) -> FdvServer:
+    """Wrap an already bound and listening socket (TCP or Unix, inherited or bound by us)."""
+    server = FdvServer(("127.0.0.1", 0), FdvHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.address_family = sock.family
+    server.server_address = sock.getsockname()
+    if sock.family == socket.AF_UNIX:
+        server.server_name, server.server_port = "localhost", 0
+    else:
+        server.server_name, server.server_port = str(server.server_address[0]), int(server.server_address[1])
+    server.unix_path = unix_path
+    return server
+
+
+def bind_unix(path: str) -> FdvServer:
+    if os.path.lexists(path):
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            raise RuntimeError(f"{path} existe déjà et n'est pas une socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)  # stale socket left by a crash
+        else:
+            raise RuntimeError(f"Socket {path} déjà utilisée par un autre serveur")
+        finally:
+            probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        sock.listen(FdvServer.request_queue_size)
+    except OSError:
+        sock.close()
+        raise
+    return adopt_server(sock, unix_path=path)
+
+
+def inherited_listener(fd_arg: int | None = None) -> Tuple[socket.socket | None, str]:
+    """Listening socket handed over by a reload, by systemd (LISTEN_FDS) or by --fd."""
+    fd = os.environ.pop(LISTEN_FD_ENV, "")
+    if fd.isdigit():
+        return socket.socket(fileno=int(fd)), "reload"
+    listen_pid = os.environ.pop("LISTEN_PID", "")
+    listen_fds = os.environ.pop("LISTEN_FDS", "")
+    os.environ.pop("LISTEN_FDNAMES", None)
+    if listen_pid == str(os.getpid()) and listen_fds.isdigit() and int(listen_fds) >= 1:
+        return socket.socket(fileno=SD_LISTEN_FDS_START), "systemd"
+    if fd_arg is not None:
+        return socket.socket(fileno=fd_arg), "fd"
+    return None, ""
+
+
+def reexec_with_listener(server: FdvServer, port: int) -> None:
+    # The listening socket stays open across exec: pending connections wait in the backlog.
+    fd = server.socket.fileno()
+    os.set_inheritable(fd, True)
+    env = dict(os.environ, **{LISTEN_FD_ENV: str(fd), "FDV_THEME": DEFAULT_THEME})
+    argv = [sys.executable] + sys.argv
+    if "--port" not in argv:
+        argv += ["--port", str(port)]
+    if "--no-open" not in argv:
+        argv.append("--no-open")
+    sys.stdout.flush()
+    os.execve(sys.executable, argv, env)
+
+
+def run_web(
+    host: str,
+    port: int,
+    no_open: bool,
+    access_log: AccessLog | None = None,
+    drain_timeout: float = 10.0,
+    unix: str | None = None,
+    fd: int | None = None,
+    trust_proxy: bool = False,
+    sse_max_per_client: int = SSE_MAX_PER_CLIENT,
+) -> int:
+    global ACCESS_LOG
+    ACCESS_LOG = access_log
+    EVENTS.max_per_client = max(0, sse_max_per_client)
+    inherited, origin = inherited_listener(fd)
+    if inherited is not None:
+        # Only a socket we bound ourselves before a reload is ours to unlink on exit.
+        owned = inherited.getsockname() if origin == "reload" and inherited.family == socket.AF_UNIX else None
+        server = adopt_server(inherited, unix_path=owned or None)
+        final_port = server.server_port
+    elif unix:
+        server, final_port = bind_unix(unix), 0
+    else:
+        server, final_port = bind_server(host, port, tries=50)
+    # Only a local process (the reverse proxy) can reach a Unix socket, so its X-Forwarded-For is trusted.
+    server.trust_proxy = trust_proxy or server.address_family == socket.AF_UNIX
+    if server.address_family == socket.AF_UNIX:
+        url = f"unix:{server.server_address}"
+        no_open = True
+    else:
+        url = f"http://{host if inherited is None else server.server_address[0]}:{final_port}"
     print(f"\n{TITLE}\nMode web local\nURL: {url}")
-    if final_port != port:
+    if inherited is not None:
+        no_open = True
+        if origin == "reload":
+            print("Socket d'écoute reprise (rechargement).")
+        else:
+            print(f"Socket d'écoute héritée via {'systemd' if origin == 'systemd' else '--fd'} (fd {inherited.fileno()}).")
+    elif not unix and final_port != port:
         print(f"Port {port} occupé, bascule automatique vers {final_port}.")
     if not no_open:
         threading.Timer(0.25, lambda: webbrowser.open(url)).start()
+
+    mode: List[str] = []
+
+    def request_stop(kind: str) -> None:
+        # serve_forever runs in this (main) thread: shutdown() must come from another one.
+        if not mode:
+            mode.append(kind)
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: request_stop("stop"))
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: request_stop("reload"))
     try:
         server.serve_forever(poll_interval=0.2)
     except KeyboardInterrupt:
         print("\nArrêt demandé.")
     finally:
         server.shutdown()
+        if not server.drain(drain_timeout):
+            print(f"Délai de vidage dépassé ({drain_timeout:g} s), {server.active_requests()} requête(s) interrompue(s).")
+        EVENTS.close_all()
+        if access_log is not None:
+            access_log.close()
+        if mode == ["reload"]:
+            print("Rechargement…")
+            reexec_with_listener(server, final_port)
         server.server_close()
         print("Serveur arrêté.")
     return 0
@@ -721,6 +2847,21 @@ def main(argv: Sequence[str] | None = None) -> int:
     parser.add_argument("--host", default="127.0.0.1", help="Host bind")
     parser.add_argument("--no-open", action="store_true", help="Ne pas ouvrir le navigateur")
     parser.add_argument("--self-test", action="store_true", help="Tests de cohérence tables")
+    parser.add_argument("--matrix", nargs="?", const="all", metavar="RACES", help="Afficher les 18 slots en tableaux (all ou liste de races)")
+    parser.add_argument("--build-static", metavar="DIR", help="Générer le site statique (page + payloads) dans DIR")
+    parser.add_argument("--gzip", action="store_true", help="Avec --build-static : écrire aussi les .gz")
+    parser.add_argument("--unix", metavar="PATH", help="Écouter sur une socket Unix (derrière un proxy local)")
+    parser.add_argument("--fd", type=int, default=None, help="Utiliser une socket d'écoute déjà ouverte (descripteur hérité)")
+    parser.add_argument("--trust-proxy", action="store_true", help="Identifier les clients par X-Forwarded-For (derrière un proxy)")
+    parser.add_argument("--sse-max-per-client", type=int, default=SSE_MAX_PER_CLIENT, help="Flux SSE max par client (0 = illimité)")
+    parser.add_argument("--drain-timeout", type=float, default=10.0, help="Arrêt/rechargement : délai max pour finir les requêtes en cours")
+    parser.add_argument("--access-log", metavar="PATH", help="Journal d'accès JSON lines (écriture en tâche de fond)")
+    parser.add_argument("--access-log-max-mb", type=float, default=10.0, help="Rotation du journal au-delà de N Mo")
+    parser.add_argument("--access-log-sample", type=int, default=10, help="Sous forte charge, garder 1 requête sur N")
+    parser.add_argument("--loadtest", metavar="URL", help="Test de charge contre un serveur FDV (ex: http://127.0.0.1:8787)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Avec --loadtest : connexions simultanées")
+    parser.add_argument("--duration", type=float, default=10.0, help="Avec --loadtest : durée en secondes")
+    parser.add_argument("--seed", type=int, default=None, help="Avec --loadtest : graine aléatoire")
     args = parser.parse_args(argv)
 
     if args.self_test:
@@ -732,27 +2873,48 @@ def main(argv: Sequence[str] | None = None) -> int:
         for e in errors:
             print("-", e)
         return 1
-    run_web(args.host, int(port), open_browser, theme)
-    return 0
 
-    if args.cli:
-        return run_cli()
+    if args.build_static:
+        manifest = build_static(args.build_static, gzip_files=args.gzip)
+        print(f"{len(manifest['files'])} fichiers écrits dans {args.build_static}")
+        return 0
 
-    if args.port is None:
-        port, auto_open, _ = ask_start(8787)
-        return run_web(args.host, port, not auto_open)
-    return run_web(args.host, args.port, args.no_open)
+    if args.loadtest:
+        try:
+            report = run_loadtest(args.loadtest, concurrency=args.concurrency, duration=args.duration, seed=args.seed)
+        except (RuntimeError, ValueError) as exc:
+            print(f"Test de charge impossible : {exc}", file=sys.stderr)
+            return 2
+        print(format_loadtest_report(report))
+        return 0 if report["total"]["errors"] == 0 else 2
+
+    if args.matrix:
+        races = None if args.matrix == "all" else [normalize_race(r) for r in args.matrix.split(",")]
+        sys.stdout.write(render_matrix_text(races, color=use_color()) + "\n")
+        return 0
 
     if args.cli:
         return run_cli()
 
-    if args.port is None:
+    access_log = None
+    if args.access_log:
+        access_log = AccessLog(args.access_log, max_bytes=int(args.access_log_max_mb * 1024 * 1024), sample=args.access_log_sample)
+
+    preset = args.unix or args.fd is not None or LISTEN_FD_ENV in os.environ or "LISTEN_FDS" in os.environ
+    if args.port is None and not preset:
         port, auto_open, theme = ask_start(8787)
         DEFAULT_THEME = theme
-        return run_web(args.host, port, not auto_open)
-
-    DEFAULT_THEME = "neon"
-    return run_web(args.host, args.port, args.no_open)
+        return run_web(
+            args.host, port, not auto_open, access_log, args.drain_timeout,
+            trust_proxy=args.trust_proxy, sse_max_per_client=args.sse_max_per_client,
+        )
+
+    DEFAULT_THEME = os.environ.pop("FDV_THEME", "neon")
+    port = 8787 if args.port is None else args.port
+    return run_web(
+        args.host, port, args.no_open, access_log, args.drain_timeout, unix=args.unix, fd=args.fd,
+        trust_proxy=args.trust_proxy, sse_max_per_client=args.sse_max_per_client,
+    )
 
 
 if __name__ == "__main__":